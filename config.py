@@ -1,71 +1,139 @@
 # config.py
 
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import FrozenSet, Tuple
+import sys
 
+class FrozenMapping(Mapping):
+    """Mapping immuable et hashable : garde Config hashable (hash(CONFIG))"""
+    __slots__ = ('_data', '_hash')
+
+    def __init__(self, *args, **kwargs):
+        self._data = dict(*args, **kwargs)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __repr__(self):
+        return f"FrozenMapping({self._data!r})"
+
+# Adresses internées : les comparaisons en aval se font par identité
+EXCLUDED_TOKENS = frozenset(sys.intern(address) for address in (
+    'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v',  # USDC
+    'Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB',  # USDT
+    '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs'   # WETH
+))
+
+SOLANA_ADDRESSES = frozenset(sys.intern(address) for address in (
+    'So11111111111111111111111111111111111111112', # WSOL
+    'So11111111111111111111111111111111111111111' # SOL
+))
+
+SWAP_PROGRAMS = FrozenMapping({
+    sys.intern(program_id): sys.intern(protocol)
+    for program_id, protocol in (
+        ("JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4", "Jupiter"),
+        ("whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc", "Orca"),
+        ("9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP", "Raydium"),
+        ("675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8", "Raydium V4"),
+        ("SwaPpA9LAaLfeLi3a68M4DjnLqgtticKg6CnyNwgAC8", "Raydium Legacy"),
+        ("DjVE6JNiYqPL2QXyCUUh8rNjHrbz9hXHNYt99MQ59qw1", "Orca Whirlpool"),
+    )
+})
+
+@dataclass(frozen=True, slots=True)
 class Config:
-    def __init__(self):
-        # Chemins des dossiers
-        self.INPUT_FOLDER = './toProcess/'
-        self.OUTPUT_FOLDER = './processed/'
-
-
-        # Configurations des tokens
-        self.EXCLUDED_TOKENS = {
-            'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v',  # USDC
-            'Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB',  # USDT
-            '7vfCXTUXx5WJV5JADk17DUJ4ksgau7utNKj4b963voxs'   # WETH
-        }
-
-        self.SOLANA_ADDRESSES = {
-            'So11111111111111111111111111111111111111112', # WSOL
-            'So11111111111111111111111111111111111111111' # SOL
-        }
-
-        # Fichier de cache
-        self.SOL_PRICE_CACHE_FILE = 'sol_price_cache.json'
-
-        # Paramètres de calcul
-        self.START_DATE = datetime.now() - timedelta(days=30)
-
-        # URLs des API
-        self.PUMP_FUN_API_URL = "https://frontend-api.pump.fun/candlesticks/{token}?offset=0&limit=1&timeframe=1"
-        self.JUPITER_API_URL = "https://price.jup.ag/v6/price?ids={token}&vsToken=USDC"
-        self.SOLSCAN_API_URL = "https://api-v2.solscan.io/v2/account/activity/dextrading?address={address}&page={{page}}&page_size=100"
-
-        # Autres paramètres solscan ou yfinance
-        self.REQUEST_TIMEOUT = 5
-        self.MAX_RETRIES = 3
-
-        #Time out de pump fun ou jupiter pour recuperer le prix des tokens (seconde)
-        self.API_TIMEOUT = 1
-
-        #get_transactions
-        self.RATE_LIMIT = {
-            'requests_per_10s': 100000,
-            'min_interval': 0.05
-        }
-
-        self.SWAP_PROGRAMS = {
-            "JUP6LkbZbjS1jKKwapdHNy74zcZ3tLUZoi5QNyVTaV4": "Jupiter",
-            "whirLbMiicVdio4qvUfM5KAg6Ct8VwpYzGff3uctyCc": "Orca",
-            "9W959DqEETiGZocYWCQPaJ6sBmUzgfxXfqGeTEdp3aQP": "Raydium",
-            "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8": "Raydium V4",
-            "SwaPpA9LAaLfeLi3a68M4DjnLqgtticKg6CnyNwgAC8": "Raydium Legacy",
-            "DjVE6JNiYqPL2QXyCUUh8rNjHrbz9hXHNYt99MQ59qw1": "Orca Whirlpool",
-        }
-
-        self.BOT_THRESHOLD = 0.75
-        self.HIGH_PROBABILITY_BOT_THRESHOLD = 0.95
-        self.EARLY_DETECTION_COUNT = 80
-        self.MODEL_PATH = 'models/wallet_classifier_pipeline.joblib'
-        self.DEFAULT_NBR_TRANSACTIONS = 500
-        self.ANALYSIS_CACHE_HOURS = 24
-        self.ARCHIVE_AFTER_DAYS = 30
-        self.CLEANUP_INTERVAL = 3600  # 1 heure
-        self.ANALYSIS_OUTPUT_DIR = "./processed"
-        self.CACHE_DIR = "./cache"
-        self.TEMP_DIR = "./temp"
-        self.ARCHIVE_DIR = "archived_analyses"
-        self.SOLANA_RPC_URL = "https://mainnet.helius-rpc.com/?api-key=0a4595b2-fcac-4086-a894-d4df21dcd82c"
-        self.RPC_TIMEOUT = 2
-        self.TRANSACTION_PROCESSING_DELAY = 0.2
\ No newline at end of file
+    # Chemins des dossiers
+    INPUT_FOLDER: str = './toProcess/'
+    OUTPUT_FOLDER: str = './processed/'
+
+
+    # Configurations des tokens
+    EXCLUDED_TOKENS: FrozenSet[str] = EXCLUDED_TOKENS
+    SOLANA_ADDRESSES: FrozenSet[str] = SOLANA_ADDRESSES
+
+    # Fichier de cache
+    SOL_PRICE_CACHE_FILE: str = 'sol_price_cache.json'
+    SOL_PRICE_ARRAY_FILE: str = 'sol_price_cache.npy'  # heure de base puis prix SOL horaires
+
+    # URLs des API
+    PUMP_FUN_API_URL: str = "https://frontend-api.pump.fun/candlesticks/{token}?offset=0&limit=1&timeframe=1"
+    JUPITER_API_URL: str = "https://price.jup.ag/v6/price?ids={token}&vsToken=USDC"
+    JUPITER_BATCH_SIZE: int = 100  # ids maximum par requête Jupiter
+    JUPITER_PRICE_TTL: int = 60  # durée (s) de mémoïsation d'un prix Jupiter courant
+    JUPITER_PRICE_CACHE_SIZE: int = 4096  # prix Jupiter mémoïsés au maximum
+    SOLSCAN_API_URL: str = "https://api-v2.solscan.io/v2/account/activity/dextrading?address={address}&page={{page}}&page_size=100"
+
+    # Autres paramètres solscan ou yfinance
+    REQUEST_TIMEOUT: int = 5
+    MAX_RETRIES: int = 3
+    RETRY_BACKOFF_BASE: float = 0.5  # délai (s) du premier réessai, doublé à chaque tentative (+ jitter)
+    RETRY_BACKOFF_CAP: float = 8.0  # délai maximum entre deux réessais (s)
+
+    #Time out de pump fun ou jupiter pour recuperer le prix des tokens (seconde)
+    API_TIMEOUT: int = 1
+    HTTP_POOL_SIZE: int = 32  # connexions keep-alive de la session HTTP des prix
+    PRICE_FETCH_WORKERS: int = 16  # threads pour les requêtes de prix par token
+    PRICE_API_RATE_LIMITS: Mapping[str, Tuple[float, float]] = FrozenMapping({
+        'pump_fun': (5, 10),  # (requêtes par seconde, rafale)
+        'jupiter': (10, 20)
+    })
+    PUMP_FUN_BREAKER_FAILURES: int = 5  # échecs consécutifs avant de court-circuiter Pump Fun
+    PUMP_FUN_BREAKER_COOLDOWN: int = 60  # durée (s) pendant laquelle Pump Fun est ignoré
+
+    #get_transactions
+    RATE_LIMIT: Mapping[str, float] = FrozenMapping({
+        # Budget réel du fournisseur RPC, appliqué par appel (un batch de 25 en consomme 25) :
+        # 200 / 10 s = 20 appels/s, le rythme de l'ancien min_interval de 0.05 s
+        'requests_per_10s': 200,
+        'concurrency': 8  # requêtes RPC simultanées
+    })
+
+    SWAP_PROGRAMS: Mapping[str, str] = SWAP_PROGRAMS
+
+    BOT_THRESHOLD: float = 0.75
+    HIGH_PROBABILITY_BOT_THRESHOLD: float = 0.95
+    EARLY_DETECTION_COUNT: int = 80
+    MODEL_PATH: str = 'models/wallet_classifier_pipeline.joblib'
+    MODEL_ONNX_PATH: str = 'models/wallet_classifier_pipeline.onnx'  # prioritaire si présent (python get_parsed_transactions.py --export-onnx)
+    DEFAULT_NBR_TRANSACTIONS: int = 500
+    ANALYSIS_CACHE_HOURS: int = 24
+    ARCHIVE_AFTER_DAYS: int = 30
+    CLEANUP_INTERVAL: int = 3600  # 1 heure
+    ANALYSIS_OUTPUT_DIR: str = "./processed"
+    CACHE_DIR: str = "./cache"
+    TEMP_DIR: str = "./temp"
+    ARCHIVE_DIR: str = "archived_analyses"
+    ANALYSIS_READ_WORKERS: int = 16  # lectures parallèles dans get_all_analyses
+    ANALYSIS_MEMORY_CACHE_SIZE: int = 1024  # analyses gardées en mémoire
+    DB_FLUSH_EVERY: int = 50  # wallets mis en attente avant écriture groupée en base
+    DB_FLUSH_INTERVAL: int = 30  # délai maximum (s) avant écriture des résultats en attente
+    REDIS_POP_COUNT: int = 8  # adresses retirées de la file Redis par BLMPOP
+    SOLANA_RPC_URL: str = "https://mainnet.helius-rpc.com/?api-key=0a4595b2-fcac-4086-a894-d4df21dcd82c"
+    RPC_TIMEOUT: int = 2
+    RPC_BATCH_TIMEOUT: int = 15  # délai (s) d'un batch getTransaction (jusqu'à 25 réponses jsonParsed)
+    RPC_BATCH_SIZE: int = 25  # getTransaction par requête batch JSON-RPC
+    RPC_PREFETCH_BATCHES: int = 8  # lots getTransaction lancés d'avance sur le traitement
+    SIGNATURES_PAGE_SIZE: int = 1000  # maximum accepté par getSignaturesForAddress
+
+    # Paramètres de calcul
+    @property
+    def START_DATE(self) -> datetime:
+        """Début de la fenêtre de calcul, recalculé à chaque accès"""
+        return datetime.now() - timedelta(days=30)
+
+CONFIG = Config()
@@ -1,41 +1,118 @@
-import psycopg2
+from psycopg2.extras import execute_batch, execute_values
+from psycopg2 import sql
+from psycopg2.extensions import adapt, register_adapter
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 from datetime import datetime
 import numpy as np
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from collections import defaultdict
+from contextlib import contextmanager
+import csv
+import hashlib
+import io
 import os
+import weakref
 
 load_dotenv()
 
+# Les scalaires NumPy (float64, int64, bool_...) sont adaptés par psycopg2 via leur
+# équivalent Python natif : plus de conversion champ par champ avant chaque requête
+register_adapter(np.generic, lambda value: adapt(value.item()))
+
 class DatabaseManager:
-    def __init__(self, logger):
-        """Initialize database connection"""
+    # Taille maximale du buffer CSV avant envoi via COPY (~64 Mo)
+    COPY_BUFFER_SIZE = 64 * 1024 * 1024
+    # Nombre de lignes à partir duquel upsert_many passe par COPY
+    COPY_THRESHOLD = 500
+    # Durée maximale d'une requête dans upsert_many (ms)
+    STATEMENT_TIMEOUT_MS = 30000
+
+    UPSERT_BEHAVIOR_PARAMS = (
+        'address', 'is_bot', 'bot_probability', 'total_swaps', 'behavior_analysis_time'
+    )
+    UPSERT_BEHAVIOR_QUERY = """
+        INSERT INTO wallet_stats (
+            address, is_bot, bot_probability,
+            total_swaps, behavior_analysis_time, last_updated
+        )
+        VALUES ($1, $2, $3, $4, $5, CURRENT_TIMESTAMP)
+        ON CONFLICT (address) DO UPDATE SET
+            is_bot = EXCLUDED.is_bot,
+            bot_probability = EXCLUDED.bot_probability,
+            total_swaps = EXCLUDED.total_swaps,
+            behavior_analysis_time = EXCLUDED.behavior_analysis_time,
+            last_updated = CURRENT_TIMESTAMP
+    """
+
+    def __init__(self, logger, minconn: int = 2, maxconn: int = 16):
+        """Initialize database connection pool"""
         self.logger = logger
-        self.connection = None
-        self.cursor = None
-        self._connect()
+        self.pool = None
+        # Noms des requêtes préparées sur chaque connexion du pool
+        self._prepared: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        # Requêtes d'upsert wallet_stats par ensemble de colonnes
+        self._stmt_cache: Dict[Tuple[str, ...], Tuple[str, str, Tuple[str, ...]]] = {}
+        self._connect(minconn, maxconn)
 
-    def _connect(self) -> None:
-        """Establish connection to database"""
+    def _connect(self, minconn: int, maxconn: int) -> None:
+        """Create the connection pool"""
         try:
-            self.connection = psycopg2.connect(
+            self.pool = ThreadedConnectionPool(
+                minconn=minconn,
+                maxconn=maxconn,
                 host=os.getenv('IP_WALLET_DB'),
                 database=os.getenv('DB_WALLET'),
                 user=os.getenv('USER_WALLET_DB'),
                 password=os.getenv('PASSWORD_WALLET_DB')
             )
-            self.cursor = self.connection.cursor()
-            self.logger.info("Database connection established successfully")
+            self.logger.info("Database connection pool established successfully")
         except Exception as e:
             self.logger.error(f"Failed to connect to database: {e}")
             raise ConnectionError(f"Database connection failed: {e}")
 
-    def _convert_numpy_types(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Convert numpy types to Python native types"""
-        return {
-            key: float(value) if isinstance(value, np.generic) else value
-            for key, value in data.items()
-        }
+    @contextmanager
+    def _cursor(self) -> Iterator[Any]:
+        """
+        Emprunte une connexion au pool le temps d'une transaction.
+        Commit en cas de succès, rollback en cas d'exception.
+        """
+        connection = self.pool.getconn()
+        try:
+            with connection:
+                with connection.cursor() as cursor:
+                    yield cursor
+        finally:
+            # Une connexion cassée est fermée plutôt que remise dans le pool
+            self.pool.putconn(connection, close=bool(connection.closed))
+
+    def _convert_numpy_batch(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Convert numpy types for a batch of dicts, one column at a time.
+        Missing fields are filled with None.
+        """
+        fields = list(dict.fromkeys(key for row in rows for key in row))
+        columns = defaultdict(list)
+        for row in rows:
+            for field in fields:
+                columns[field].append(row.get(field))
+
+        for field, values in columns.items():
+            if not isinstance(values[0], np.generic):
+                continue
+            array = np.asarray(values)
+            if array.dtype != object:
+                # Une seule conversion C pour toute la colonne
+                columns[field] = array.tolist()
+            else:
+                columns[field] = [
+                    value.item() if hasattr(value, 'item') else value for value in values
+                ]
+
+        return [
+            dict(zip(fields, values))
+            for values in zip(*(columns[field] for field in fields))
+        ]
 
     def update_wallet_stats(self, address: str, stats: Dict[str, Any]) -> None:
         """
@@ -46,34 +123,190 @@ class DatabaseManager:
             stats: Dictionary containing wallet statistics
         """
         try:
-            # Convert numpy types to Python native types
-            converted_stats = self._convert_numpy_types(stats)
-            
-            # Prepare the query
-            fields = list(converted_stats.keys())
-            placeholders = ', '.join(['%s' for _ in fields])
-            update_set = ', '.join([f"{field} = EXCLUDED.{field}" for field in fields])
-            
-            query = f"""
-                INSERT INTO wallet_stats (address, {', '.join(fields)})
-                VALUES (%s, {placeholders})
-                ON CONFLICT (address)
-                DO UPDATE SET {update_set};
-            """
-            
-            # Prepare values for the query
-            values = (address,) + tuple(converted_stats.values())
+            fields = tuple(sorted(stats.keys()))
             
             # Execute query
-            self.cursor.execute(query, values)
-            self.connection.commit()
+            with self._cursor() as cursor:
+                name, statement, param_names = self._get_stats_statement(cursor, fields)
+                self._execute_prepared(
+                    cursor,
+                    name,
+                    statement,
+                    param_names,
+                    {**stats, 'address': address}
+                )
             self.logger.info(f"Successfully updated stats for wallet: {address}")
 
         except Exception as e:
             self.logger.error(f"Error updating wallet stats: {e}")
-            self.connection.rollback()
             raise
 
+    def _get_stats_statement(self,
+                             cursor,
+                             fields: Tuple[str, ...]) -> Tuple[str, str, Tuple[str, ...]]:
+        """
+        Retourne (nom, requête, paramètres) de l'upsert wallet_stats pour
+        un ensemble de colonnes, construit une seule fois puis mis en cache
+        """
+        cached = self._stmt_cache.get(fields)
+        if cached is not None:
+            return cached
+
+        columns = ('address',) + fields
+        query = sql.SQL("""
+            INSERT INTO wallet_stats ({columns})
+            VALUES ({placeholders})
+            ON CONFLICT (address)
+            DO UPDATE SET {update_set}
+        """).format(
+            columns=sql.SQL(', ').join(map(sql.Identifier, columns)),
+            placeholders=sql.SQL(', ').join(
+                sql.SQL(f"${position}") for position in range(1, len(columns) + 1)
+            ),
+            update_set=sql.SQL(', ').join(
+                sql.SQL("{field} = EXCLUDED.{field}").format(field=sql.Identifier(field))
+                for field in fields
+            )
+        )
+
+        digest = hashlib.md5(','.join(fields).encode()).hexdigest()[:12]
+        cached = (f"upsert_stats_{digest}", query.as_string(cursor), columns)
+        self._stmt_cache[fields] = cached
+        return cached
+
+    def update_wallet_stats_bulk(self, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Update statistics for many wallets in a single transaction
+
+        Args:
+            rows: List of (address, stats) tuples. Missing fields are stored as NULL.
+        """
+        if not rows:
+            return
+
+        try:
+            with self._cursor() as cursor:
+                self._upsert_values(cursor, rows, page_size=1000)
+            self.logger.info(f"Successfully updated stats for {len(rows)} wallets")
+
+        except Exception as e:
+            self.logger.error(f"Error bulk updating wallet stats: {e}")
+            raise
+
+    def bulk_upsert_via_copy(self, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Upsert a large number of wallets through COPY into a staging table
+
+        Args:
+            rows: List of (address, stats) tuples. Missing fields are stored as NULL.
+        """
+        if not rows:
+            return
+
+        try:
+            with self._cursor() as cursor:
+                self._upsert_copy(cursor, rows)
+            self.logger.info(f"Successfully copied stats for {len(rows)} wallets")
+
+        except Exception as e:
+            self.logger.error(f"Error copying wallet stats: {e}")
+            raise
+
+    def upsert_many(self,
+                    rows: List[Tuple[str, Dict[str, Any]]],
+                    flush_every: Optional[int] = None) -> None:
+        """
+        Upsert wallet statistics, choosing execute_values or COPY by batch size
+
+        Args:
+            rows: List of (address, stats) tuples. Missing fields are stored as NULL.
+            flush_every: Commit every N rows (a single transaction if None)
+        """
+        if not rows:
+            return
+
+        chunk_size = flush_every or len(rows)
+        try:
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                with self._cursor() as cursor:
+                    # Borne la latence de queue de chaque transaction
+                    cursor.execute(
+                        "SET LOCAL statement_timeout = %s", (self.STATEMENT_TIMEOUT_MS,)
+                    )
+                    # Petits lots : latence de execute_values ; gros lots : débit de COPY
+                    if len(chunk) < self.COPY_THRESHOLD:
+                        self._upsert_values(cursor, chunk, page_size=100)
+                    else:
+                        self._upsert_copy(cursor, chunk)
+            self.logger.info(f"Successfully upserted stats for {len(rows)} wallets")
+
+        except Exception as e:
+            self.logger.error(f"Error upserting wallet stats: {e}")
+            raise
+
+    def _upsert_values(self,
+                       cursor,
+                       rows: List[Tuple[str, Dict[str, Any]]],
+                       page_size: int) -> None:
+        """Upsert via execute_values, sans commit"""
+        # Union des colonnes de toutes les lignes, dans l'ordre d'apparition
+        converted_rows = self._convert_numpy_batch([stats for _, stats in rows])
+        fields = list(converted_rows[0])
+        update_set = ', '.join([f"{field} = EXCLUDED.{field}" for field in fields])
+
+        query = f"""
+            INSERT INTO wallet_stats (address, {', '.join(fields)})
+            VALUES %s
+            ON CONFLICT (address)
+            DO UPDATE SET {update_set};
+        """
+
+        values = (
+            (address,) + tuple(converted.values())
+            for (address, _), converted in zip(rows, converted_rows)
+        )
+        execute_values(cursor, query, values, page_size=page_size)
+
+    def _upsert_copy(self, cursor, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Upsert via COPY dans une table de staging, sans commit"""
+        converted_rows = self._convert_numpy_batch([stats for _, stats in rows])
+        fields = list(converted_rows[0])
+        columns = ', '.join(['address'] + fields)
+        update_set = ', '.join([f"{field} = EXCLUDED.{field}" for field in fields])
+        copy_query = f"COPY wallet_stats_stage ({columns}) FROM STDIN WITH CSV"
+
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS wallet_stats_stage
+            (LIKE wallet_stats INCLUDING DEFAULTS)
+            ON COMMIT DROP;
+        """)
+
+        # Sérialiser en CSV par blocs pour borner la mémoire
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for (address, _), converted in zip(rows, converted_rows):
+            writer.writerow([address] + list(converted.values()))
+            if buffer.tell() >= self.COPY_BUFFER_SIZE:
+                self._copy_buffer(cursor, copy_query, buffer)
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+        self._copy_buffer(cursor, copy_query, buffer)
+
+        cursor.execute(f"""
+            INSERT INTO wallet_stats ({columns})
+            SELECT {columns} FROM wallet_stats_stage
+            ON CONFLICT (address)
+            DO UPDATE SET {update_set};
+        """)
+
+    def _copy_buffer(self, cursor, copy_query: str, buffer: io.StringIO) -> None:
+        """Stream a CSV buffer into the staging table"""
+        if buffer.tell() == 0:
+            return
+        buffer.seek(0)
+        cursor.copy_expert(copy_query, buffer)
+
     def update_behavior_metrics(self, address: str, metrics: Dict[str, Any]) -> None:
         """
         Update behavioral metrics in database
@@ -83,55 +316,98 @@ class DatabaseManager:
             metrics: Dictionary containing behavioral metrics
         """
         try:
-            converted_metrics = self._convert_numpy_types(metrics)
-            
             # Ajouter le timestamp actuel pour behavior_analysis_time
             current_time = datetime.now()
             
-            query = """
-                UPDATE wallet_stats 
-                SET 
-                    is_bot = %(is_bot)s,
-                    bot_probability = %(bot_probability)s,
-                    total_swaps = %(total_swaps)s,
-                    behavior_analysis_time = %(behavior_analysis_time)s,
-                    last_updated = CURRENT_TIMESTAMP
-                WHERE address = %(address)s;
-                
-                INSERT INTO wallet_stats (
-                    address, is_bot, bot_probability, 
-                    total_swaps, behavior_analysis_time, last_updated
-                )
-                VALUES (
-                    %(address)s, %(is_bot)s, %(bot_probability)s,
-                    %(total_swaps)s, %(behavior_analysis_time)s, CURRENT_TIMESTAMP
-                )
-                ON CONFLICT (address) DO NOTHING;
-            """
-            
             params = {
-                **converted_metrics,
+                **metrics,
                 'address': address,
                 'behavior_analysis_time': current_time
             }
             
-            self.cursor.execute(query, params)
-            self.connection.commit()
+            with self._cursor() as cursor:
+                self._execute_prepared(
+                    cursor,
+                    'upsert_behavior',
+                    self.UPSERT_BEHAVIOR_QUERY,
+                    self.UPSERT_BEHAVIOR_PARAMS,
+                    params
+                )
             self.logger.info(f"Successfully updated behavioral metrics for wallet: {address}")
 
         except Exception as e:
             self.logger.error(f"Error updating behavioral metrics: {e}")
-            self.connection.rollback()
+            raise
+
+    def _execute_prepared(self,
+                          cursor,
+                          name: str,
+                          statement: str,
+                          param_names: Tuple[str, ...],
+                          params: Dict[str, Any]) -> None:
+        """
+        Exécute une requête préparée côté serveur, en la préparant
+        une seule fois par connexion
+        """
+        self._ensure_prepared(cursor, name, statement)
+        cursor.execute(self._execute_query(name, param_names), params)
+
+    def _ensure_prepared(self, cursor, name: str, statement: str) -> None:
+        """Prépare la requête sur la connexion du curseur si nécessaire"""
+        prepared = self._prepared.setdefault(cursor.connection, set())
+        if name not in prepared:
+            cursor.execute(f"PREPARE {name} AS {statement}")
+            prepared.add(name)
+
+    @staticmethod
+    def _execute_query(name: str, param_names: Tuple[str, ...]) -> str:
+        """Construit l'appel EXECUTE avec des paramètres nommés"""
+        placeholders = ', '.join([f"%({param})s" for param in param_names])
+        return f"EXECUTE {name} ({placeholders})"
+
+    def update_behavior_metrics_bulk(self, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Update behavioral metrics for many wallets in a single transaction
+
+        Args:
+            rows: List of (address, metrics) tuples
+        """
+        if not rows:
+            return
+
+        try:
+            current_time = datetime.now()
+            params = (
+                {
+                    **metrics,
+                    'address': address,
+                    'behavior_analysis_time': current_time
+                }
+                for address, metrics in rows
+            )
+
+            # execute_batch regroupe les EXECUTE par pages : un aller-retour
+            # réseau pour 100 wallets au lieu d'un par wallet
+            with self._cursor() as cursor:
+                self._ensure_prepared(cursor, 'upsert_behavior', self.UPSERT_BEHAVIOR_QUERY)
+                execute_batch(
+                    cursor,
+                    self._execute_query('upsert_behavior', self.UPSERT_BEHAVIOR_PARAMS),
+                    params,
+                    page_size=100
+                )
+            self.logger.info(f"Successfully updated behavioral metrics for {len(rows)} wallets")
+
+        except Exception as e:
+            self.logger.error(f"Error bulk updating behavioral metrics: {e}")
             raise
 
     def close(self) -> None:
-        """Close database connection"""
+        """Close all pooled database connections"""
         try:
-            if self.cursor:
-                self.cursor.close()
-            if self.connection:
-                self.connection.close()
-                self.logger.info("Database connection closed successfully")
+            if self.pool and not self.pool.closed:
+                self.pool.closeall()
+                self.logger.info("Database connection pool closed successfully")
         except Exception as e:
             self.logger.error(f"Error closing database connection: {e}")
 
@@ -1,17 +1,121 @@
 # file_service.py
+import fnmatch
 import os
-import shutil
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict
-import json
+from typing import Any, Optional, List, Dict, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
 from pathlib import Path
+import sqlite3
+import threading
 import time
+import orjson
+import zstandard as zstd
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC | orjson.OPT_INDENT_2
+
+def _json_default(obj: Any) -> Any:
+    """Sérialise les types non supportés nativement par orjson"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+def _parse_date_folder(name: str) -> datetime:
+    """Parse un nom de dossier au format YYYY-MM-DD"""
+    parts = name.split('-')
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Invalid date folder: {name}")
+    return datetime(int(parts[0]), int(parts[1]), int(parts[2]))
+
+def _compress_file(compressor: zstd.ZstdCompressor, src: str, dst: str) -> None:
+    """Compresse un fichier en zstd par flux (mémoire bornée) puis supprime la source"""
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        compressor.copy_stream(fin, fout)
+    os.unlink(src)
+
+class AnalysisIndex:
+    """
+    Index SQLite des analyses sauvegardées (adresse -> fichiers)
+    """
+    def __init__(self, db_path: str, logger):
+        self.logger = logger
+        self.connection = sqlite3.connect(db_path)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS idx (
+                    path TEXT PRIMARY KEY,
+                    address TEXT NOT NULL,
+                    mtime REAL NOT NULL
+                )
+            """)
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS addr_mtime ON idx(address, mtime DESC)"
+            )
+
+    def add(self, address: str, mtime: float, path: str) -> None:
+        """Ajoute ou met à jour une entrée"""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO idx (path, address, mtime) VALUES (?, ?, ?)",
+                (path, address, mtime)
+            )
+
+    def remove(self, path: str) -> None:
+        """Supprime une entrée"""
+        with self.connection:
+            self.connection.execute("DELETE FROM idx WHERE path = ?", (path,))
+
+    def latest_paths(self, address: str, min_mtime: float) -> List[str]:
+        """Fichiers d'une adresse plus récents que min_mtime, du plus récent au plus ancien"""
+        rows = self.connection.execute(
+            "SELECT path FROM idx WHERE address = ? AND mtime > ? ORDER BY mtime DESC",
+            (address, min_mtime)
+        )
+        return [path for (path,) in rows]
+
+    def paths_since(self, address: str, min_mtime: float) -> List[str]:
+        """Fichiers d'une adresse modifiés depuis min_mtime (inclus)"""
+        rows = self.connection.execute(
+            "SELECT path FROM idx WHERE address = ? AND mtime >= ? ORDER BY mtime",
+            (address, min_mtime)
+        )
+        return [path for (path,) in rows]
+
+    def rebuild(self, output_dir: str) -> None:
+        """Reconstruit l'index à partir des fichiers présents sur le disque"""
+        entries = []
+        root = Path(output_dir)
+        with os.scandir(root) as date_dirs:
+            for date_dir in date_dirs:
+                if not date_dir.is_dir(follow_symlinks=False):
+                    continue
+                with os.scandir(date_dir.path) as files:
+                    for file in files:
+                        if not file.name.endswith('.json'):
+                            continue
+                        address = file.name.rsplit('_', 1)[0]
+                        path = str(root / date_dir.name / file.name)
+                        entries.append((path, address, file.stat().st_mtime))
+
+        with self.connection:
+            self.connection.execute("DELETE FROM idx")
+            self.connection.executemany(
+                "INSERT INTO idx (path, address, mtime) VALUES (?, ?, ?)",
+                entries
+            )
+        self.logger.info(f"Analysis index rebuilt with {len(entries)} entries")
 
 class FileService:
     def __init__(self, logger, config):
         self.logger = logger
         self.config = config
         self._ensure_directories()
+        self.analysis_index = AnalysisIndex(
+            os.path.join(self.config.CACHE_DIR, "analysis_index.db"),
+            logger
+        )
+        self.analysis_index.rebuild(self.config.ANALYSIS_OUTPUT_DIR)
 
     def _ensure_directories(self) -> None:
         """Crée les répertoires nécessaires"""
@@ -29,15 +133,16 @@ class FileService:
     def clear_directory(self, directory: str, pattern: Optional[str] = None) -> None:
         """Nettoie un répertoire"""
         try:
-            path = Path(directory)
-            if not path.exists():
+            if not os.path.isdir(directory):
                 return
                 
-            for item in path.iterdir():
-                if item.is_file():
-                    if pattern is None or item.match(pattern):
-                        item.unlink()
-                        self.logger.debug(f"Deleted file: {item}")
+            # DirEntry porte le d_type : pas de stat() par fichier
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        if pattern is None or fnmatch.fnmatchcase(entry.name, pattern):
+                            os.unlink(entry.path)
+                            self.logger.debug(f"Deleted file: {entry.path}")
             
             self.logger.info(f"Directory cleaned: {directory}")
         except Exception as e:
@@ -52,22 +157,42 @@ class AnalysisFileManager:
         self.file_service = file_service
         self.logger = file_service.logger
         self.config = file_service.config
+        self.index = file_service.analysis_index
+        # Cache mémoire write-through : adresse -> (mtime, analyse)
+        self._mem_cache: OrderedDict[str, Tuple[float, Dict]] = OrderedDict()
+        self._mem_cache_lock = threading.Lock()
+
+    def _cache_analysis(self, address: str, mtime: float, analysis: Dict) -> None:
+        """Ajoute une analyse au cache mémoire en évinçant la plus ancienne si plein"""
+        with self._mem_cache_lock:
+            self._mem_cache[address] = (mtime, analysis)
+            self._mem_cache.move_to_end(address)
+            while len(self._mem_cache) > self.config.ANALYSIS_MEMORY_CACHE_SIZE:
+                self._mem_cache.popitem(last=False)
 
     def save_wallet_analysis(self, address: str, analysis_data: Dict) -> str:
         """
         Sauvegarde l'analyse d'un wallet avec organisation par date
         """
         try:
-            date_folder = datetime.now().strftime("%Y-%m-%d")
+            # Une seule lecture de l'horloge, sans construire de datetime
+            now_ns = time.time_ns()
+            now_s = now_ns // 1_000_000_000
+            date_folder = time.strftime("%Y-%m-%d", time.localtime(now_s))
             output_dir = Path(self.config.ANALYSIS_OUTPUT_DIR) / date_folder
             output_dir.mkdir(parents=True, exist_ok=True)
             
-            filename = f"{address}_{int(time.time())}.json"
+            filename = f"{address}_{now_s}.json"
             file_path = output_dir / filename
             
-            with open(file_path, 'w') as f:
-                json.dump(analysis_data, f, indent=2, default=str)
+            payload = orjson.dumps(analysis_data, default=_json_default, option=ORJSON_OPTIONS)
+            with open(file_path, 'wb') as f:
+                f.write(payload)
             
+            mtime = now_ns / 1_000_000_000
+            self.index.add(address, mtime, str(file_path))
+            # Même représentation qu'une relecture depuis le disque
+            self._cache_analysis(address, mtime, orjson.loads(payload))
             self.logger.info(f"Analysis saved to {file_path}")
             return str(file_path)
             
@@ -80,22 +205,23 @@ class AnalysisFileManager:
         Récupère la dernière analyse pour une adresse
         """
         try:
-            output_dir = Path(self.config.ANALYSIS_OUTPUT_DIR)
-            cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-            
-            latest_file = None
-            latest_time = 0
-            
-            # Rechercher dans tous les sous-dossiers
-            for file_path in output_dir.rglob(f"{address}_*.json"):
-                file_time = file_path.stat().st_mtime
-                if file_time > latest_time and datetime.fromtimestamp(file_time) > cutoff_time:
-                    latest_file = file_path
-                    latest_time = file_time
+            cutoff_ts = (datetime.now() - timedelta(hours=max_age_hours)).timestamp()
+
+            with self._mem_cache_lock:
+                cached = self._mem_cache.get(address)
+            if cached and cached[0] > cutoff_ts:
+                return cached[1]
             
-            if latest_file:
-                with open(latest_file, 'r') as f:
-                    return json.load(f)
+            # Parcourir les fichiers indexés du plus récent au plus ancien
+            for file_path in self.index.latest_paths(address, cutoff_ts):
+                try:
+                    with open(file_path, 'rb') as f:
+                        analysis = orjson.loads(f.read())
+                    self._cache_analysis(address, os.path.getmtime(file_path), analysis)
+                    return analysis
+                except FileNotFoundError:
+                    # Fichier supprimé hors de l'application
+                    self.index.remove(file_path)
                     
             return None
             
@@ -113,32 +239,41 @@ class AnalysisFileManager:
             
             cutoff_date = datetime.now() - timedelta(days=days)
             output_dir = Path(self.config.ANALYSIS_OUTPUT_DIR)
+            compressor = zstd.ZstdCompressor(level=3, threads=-1)
             
-            # Parcourir tous les sous-dossiers
-            for date_dir in output_dir.iterdir():
-                if not date_dir.is_dir():
-                    continue
-                    
-                try:
-                    dir_date = datetime.strptime(date_dir.name, "%Y-%m-%d")
+            # Parcourir tous les sous-dossiers (scandir réutilise le type
+            # renvoyé par getdents, sans stat() supplémentaire)
+            with os.scandir(output_dir) as date_dirs:
+                for date_dir in date_dirs:
+                    if not date_dir.is_dir(follow_symlinks=False):
+                        continue
+                        
+                    try:
+                        dir_date = _parse_date_folder(date_dir.name)
+                    except ValueError:
+                        # Ignore les dossiers qui ne suivent pas le format de date
+                        continue
+
                     if dir_date < cutoff_date:
                         # Créer le dossier d'archive correspondant
                         archive_date_dir = archive_dir / date_dir.name
                         archive_date_dir.mkdir(parents=True, exist_ok=True)
                         
                         # Déplacer tous les fichiers
-                        for file_path in date_dir.glob("*.json"):
-                            archive_path = archive_date_dir / file_path.name
-                            shutil.move(str(file_path), str(archive_path))
-                            self.logger.debug(f"Archived {file_path.name}")
+                        with os.scandir(date_dir.path) as files:
+                            for file in files:
+                                if not file.name.endswith('.json'):
+                                    continue
+                                archive_path = archive_date_dir / f"{file.name}.zst"
+                                _compress_file(compressor, file.path, str(archive_path))
+                                self.index.remove(file.path)
+                                self.logger.debug(f"Archived {file.name}")
                         
                         # Supprimer le dossier source s'il est vide
-                        if not any(date_dir.iterdir()):
-                            date_dir.rmdir()
-                            
-                except ValueError:
-                    # Ignore les dossiers qui ne suivent pas le format de date
-                    continue
+                        try:
+                            os.rmdir(date_dir.path)
+                        except OSError:
+                            pass
                     
             self.logger.info("Archives updated successfully")
             
@@ -146,24 +281,29 @@ class AnalysisFileManager:
             self.logger.error(f"Error during archiving: {e}")
             raise
 
+    def _read_analysis(self, file_path: str) -> Optional[Dict]:
+        """Lit un fichier d'analyse, None en cas d'erreur"""
+        try:
+            with open(file_path, 'rb') as f:
+                return orjson.loads(f.read())
+        except Exception as e:
+            self.logger.error(f"Error reading analysis file {file_path}: {e}")
+            return None
+
     def get_all_analyses(self, address: str, days: int = 7) -> List[Dict]:
         """
         Récupère toutes les analyses pour une adresse sur une période donnée
         """
-        analyses = []
         start_date = datetime.now() - timedelta(days=days)
         
         try:
-            output_dir = Path(self.config.ANALYSIS_OUTPUT_DIR)
-            for file_path in output_dir.rglob(f"{address}_*.json"):
-                if datetime.fromtimestamp(file_path.stat().st_mtime) >= start_date:
-                    try:
-                        with open(file_path, 'r') as f:
-                            analyses.append(json.load(f))
-                    except Exception as e:
-                        self.logger.error(f"Error reading analysis file {file_path}: {e}")
-                    
-            return analyses
+            # Fenêtre temporelle résolue par l'index, sans parcourir les dossiers
+            paths = self.index.paths_since(address, start_date.timestamp())
+
+            # Lectures en parallèle pour exploiter la profondeur de file du disque
+            with ThreadPoolExecutor(max_workers=self.config.ANALYSIS_READ_WORKERS) as executor:
+                results = executor.map(self._read_analysis, paths)
+                return [analysis for analysis in results if analysis is not None]
             
         except Exception as e:
             self.logger.error(f"Error retrieving analyses for {address}: {e}")
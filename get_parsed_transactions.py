@@ -1,13 +1,115 @@
 # analyzer.py
-import requests
+import asyncio
+import httpx
 import time
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Tuple, Optional
-import joblib
-import pandas as pd
+from typing import Deque, List, Dict, Tuple, Optional, Union
 import numpy as np
-from collections import defaultdict, Counter
-import json
+import orjson
+import os
+import random
+import sys
+import warnings
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick est optionnel : repli sur la recherche par sous-chaînes
+    ahocorasick = None
+
+try:
+    from numba import njit
+except ImportError:  # numba est optionnel : repli sur le calcul Python
+    njit = None
+
+if njit is not None:
+    @njit(cache=True)
+    def _entropy_nb(a):
+        """Entropie de Shannon d'un tableau d'entiers (tri + comptage des séquences)"""
+        a = np.sort(a)
+        n = a.shape[0]
+        acc = 0.0
+        count = 1
+        for i in range(1, n):
+            if a[i] == a[i - 1]:
+                count += 1
+            else:
+                p = count / n
+                acc -= p * np.log2(p)
+                count = 1
+        p = count / n
+        acc -= p * np.log2(p)
+        return acc
+else:
+    _entropy_nb = None
+
+SYSTEM_PROGRAM = sys.intern('11111111111111111111111111111111')
+
+# Liste ordonnée des features comme dans le modèle entraîné
+FEATURE_NAMES = (
+    'total_transactions',
+    'avg_fee',
+    'std_fee',
+    'avg_time_between_tx',
+    'time_variance',
+    'avg_time_between_account_tx',
+    'unique_accounts_count',
+    'account_diversity_score',
+    'avg_instructions_per_tx',
+    'instruction_complexity_score',
+    'system_program_interaction_ratio',
+    'signature_entropy',
+    'slot_variation'
+)
+
+def export_model_to_onnx(model_path: str, onnx_path: str) -> None:
+    """
+    Exporte une fois le pipeline joblib en ONNX (nécessite skl2onnx) pour
+    l'inférence via onnxruntime ; voir `python get_parsed_transactions.py --export-onnx`
+    """
+    import joblib
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+
+    model = joblib.load(model_path)
+    onx = convert_sklearn(
+        model,
+        initial_types=[('X', FloatTensorType([None, len(FEATURE_NAMES)]))],
+        options={'zipmap': False}
+    )
+    with open(onnx_path, 'wb') as f:
+        f.write(onx.SerializeToString())
+
+class AsyncTokenBucket:
+    """
+    Limiteur de débit à seau de jetons partagé entre les tâches asyncio :
+    `rate` jetons par seconde, rafales jusqu'à `capacity`
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Verrou créé à la demande : lié à la boucle courante, recréé si analyze_wallet en change
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, tokens: float = 1):
+        """Attend que `tokens` jetons soient disponibles puis les consomme"""
+        tokens = min(tokens, self.capacity)
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
 
 class SolanaSwapAnalyzer:
     def __init__(self, logger, config):
@@ -20,28 +122,120 @@ class SolanaSwapAnalyzer:
         """
         self.logger = logger
         self.config = config
-        self.last_request_time = 0
         self.request_count = 0
 
-        # Charger le modèle de détection des bots
+        # Boucle et client HTTP conservés d'un wallet à l'autre (réutilisation TCP+TLS)
+        self._loop = None
+        self._client = None
+
+        # Budget du fournisseur RPC : chaque appel (y compris dans un batch) consomme un jeton
+        requests_per_second = self.config.RATE_LIMIT['requests_per_10s'] / 10
+        # Capacité d'au moins un batch complet, sinon un batch ne paierait pas tous ses appels
+        self._rate_limiter = AsyncTokenBucket(
+            requests_per_second, max(requests_per_second, self.config.RPC_BATCH_SIZE)
+        )
+
+        # Modèle de détection des bots chargé au premier usage (voir la propriété model)
+        self._model = None
+        self._model_loaded = False
+        self._onnx_input = None
+
+        self._swap_keys = frozenset(self.config.SWAP_PROGRAMS)
+
+        # Automate unique sur les program IDs de swap pour scanner les logs en une passe
+        self._swap_ac = None
+        if ahocorasick is not None:
+            self._swap_ac = ahocorasick.Automaton()
+            for rank, (program_id, protocol) in enumerate(self.config.SWAP_PROGRAMS.items()):
+                self._swap_ac.add_word(program_id, (rank, protocol))
+            self._swap_ac.make_automaton()
+
+    @property
+    def model(self):
+        """
+        Modèle de détection des bots, chargé au premier accès : session ONNX Runtime
+        si le modèle exporté et onnxruntime sont disponibles, sinon pipeline joblib
+        """
+        if not self._model_loaded:
+            self._model_loaded = True
+            self._model = self._load_onnx_model() or self._load_joblib_model()
+        return self._model
+
+    def _load_onnx_model(self):
+        """Session ONNX Runtime sur MODEL_ONNX_PATH, ou None si indisponible"""
+        if not os.path.exists(self.config.MODEL_ONNX_PATH):
+            return None
+        try:
+            import onnxruntime as ort
+            session = ort.InferenceSession(self.config.MODEL_ONNX_PATH,
+                                           providers=['CPUExecutionProvider'])
+            self._onnx_input = session.get_inputs()[0].name
+            self.logger.info("Bot detection model loaded successfully (ONNX)")
+            return session
+        except Exception as e:
+            self.logger.warning(f"ONNX model unavailable, falling back to joblib: {e}")
+            return None
+
+    def _load_joblib_model(self):
+        """Pipeline scikit-learn sérialisé avec joblib, ou None en cas d'échec"""
         try:
-            self.model = joblib.load(self.config.MODEL_PATH)
+            import joblib
+            model = joblib.load(self.config.MODEL_PATH)
             self.logger.info("Bot detection model loaded successfully")
+            trained_on = getattr(model, 'feature_names_in_', None)
+            if trained_on is not None and tuple(trained_on) != FEATURE_NAMES:
+                self.logger.error(f"Feature order mismatch with model: {list(trained_on)}")
+            return model
         except Exception as e:
             self.logger.error(f"Failed to load bot detection model: {e}")
-            self.model = None
+            return None
 
-    def analyze_wallet(self, address: str, max_transactions: Optional[int] = None) -> Dict:
+    def analyze_wallet(self, address: str, max_transactions: Optional[int] = None, *,
+                       classify: bool = True) -> Dict:
         """
         Analyse complète d'un wallet Solana
         
         Args:
             address: Adresse du wallet à analyser
             max_transactions: Nombre maximum de transactions à analyser (optional)
+            classify: Si False, pas de détection de bot (bot_probability vaut None)
             
         Returns:
             Dict contenant les résultats de l'analyse
         """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self._analyze_async(address, max_transactions, classify))
+
+    def close(self):
+        """Ferme le client HTTP et la boucle d'événements"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        if self._client is not None:
+            self._loop.run_until_complete(self._client.aclose())
+            self._client = None
+        self._loop.close()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Client HTTP/2 créé à la première analyse puis réutilisé"""
+        if self._client is None:
+            # HTTP/2 : les requêtes en vol sont multiplexées sur une seule connexion TCP+TLS
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=self.config.RPC_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.config.RATE_LIMIT['concurrency'],
+                    max_keepalive_connections=self.config.RATE_LIMIT['concurrency']
+                )
+            )
+        return self._client
+
+    async def _analyze_async(self, address: str, max_transactions: Optional[int] = None,
+                             classify: bool = True) -> Dict:
+        """
+        Pipeline asynchrone de analyze_wallet : les requêtes RPC sont émises
+        en parallèle (bornées par un sémaphore), le traitement suit l'ordre des signatures
+        """
         self.logger.info(f"Starting analysis for wallet: {address}")
         
         # Utiliser la valeur par défaut de la config si non spécifiée
@@ -50,47 +244,96 @@ class SolanaSwapAnalyzer:
         all_transactions = []
         swaps_data = []
         start_time = time.time()
+        semaphore = asyncio.Semaphore(self.config.RATE_LIMIT['concurrency'])
         
-        # Récupérer les signatures
-        sig_response = self._make_rpc_request(
-            "getSignaturesForAddress",
-            [address, {"limit": max_transactions}]
-        )
+        client = self._get_client()
+
+        # Première page de signatures : une erreur ici fait échouer l'analyse
+        page_size = self.config.SIGNATURES_PAGE_SIZE
+        first_limit = min(page_size, max_transactions)
+        sig_response = await self._get_signatures_page(client, semaphore, address, first_limit)
         
         if "error" in sig_response:
             self.logger.error("Failed to fetch signatures")
             return {"error": "Error fetching signatures"}
         
         signatures = sig_response.get('result', [])
-        total_sigs = len(signatures)
-        self.logger.info(f"Found {total_sigs} transactions to analyze")
+        self.logger.info(f"Found {len(signatures)} transactions to analyze")
         
         early_detection_triggered = False
         
-        # Analyser chaque transaction
-        for idx, sig_info in enumerate(signatures, 1):
-            self.logger.debug(f"Processing transaction {idx}/{total_sigs}")
-            
-            transaction = self._get_transaction(sig_info['signature'])
-            if not transaction:
-                continue
-                
-            all_transactions.append(transaction)
-            
-            # Détecter et analyser les swaps
-            if swap_info := self._process_swap(transaction, sig_info):
-                swaps_data.append(swap_info)
-            
-            # Détection précoce des bots
-            if (len(all_transactions) == self.config.EARLY_DETECTION_COUNT and 
-                 self._perform_early_detection(all_transactions)):
-                early_detection_triggered = True
-                break
-            
-            time.sleep(self.config.TRANSACTION_PROCESSING_DELAY)
-        
+        # Lots de signatures publiés dans l'ordre ; None marque la fin
+        queue: asyncio.Queue = asyncio.Queue()
+        pager = None
+        remaining = max_transactions - len(signatures)
+        if len(signatures) == first_limit and remaining > 0:
+            # Pagination lancée avant les lots de la première page pour passer en tête
+            # du sémaphore : les pages suivantes arrivent pendant les getTransaction
+            pager = asyncio.create_task(self._paginate_signatures(
+                client, semaphore, address, remaining,
+                signatures[-1]['signature'], queue
+            ))
+        self._enqueue_batches(signatures, queue)
+        if pager is None:
+            queue.put_nowait(None)
+
+        # Fenêtre de prefetch : au plus RPC_PREFETCH_BATCHES lots getTransaction lancés
+        # d'avance, complétée à mesure que le traitement avance (la détection précoce
+        # n'a ainsi déclenché que quelques lots de trop)
+        window: Deque[Tuple[List[Dict], asyncio.Task]] = deque()
+        exhausted = False
+        try:
+            idx = 0
+            while True:
+                while not exhausted and len(window) < self.config.RPC_PREFETCH_BATCHES:
+                    # Des lots sont en vol : ne pas attendre la prochaine page pour traiter
+                    if window and queue.empty():
+                        break
+                    batch = await queue.get()
+                    if batch is None:
+                        exhausted = True
+                        break
+                    window.append((batch, asyncio.create_task(self._get_transactions(
+                        client, semaphore, [sig_info['signature'] for sig_info in batch]
+                    ))))
+                if not window:
+                    break
+
+                batch, task = window.popleft()
+                transactions = await task
+                protocols = self._classify_swaps_batch(transactions)
+
+                for sig_info, transaction, protocol in zip(batch, transactions, protocols):
+                    idx += 1
+                    self.logger.debug("Processing transaction %d", idx)
+                    
+                    if not transaction:
+                        continue
+                        
+                    all_transactions.append(transaction)
+                    
+                    # Détecter et analyser les swaps
+                    if swap_info := self._process_swap(transaction, sig_info, protocol):
+                        swaps_data.append(swap_info)
+                    
+                    # Détection précoce des bots
+                    if (classify and
+                         len(all_transactions) == self.config.EARLY_DETECTION_COUNT and 
+                         self._perform_early_detection(all_transactions)):
+                        early_detection_triggered = True
+                        break
+
+                if early_detection_triggered:
+                    break
+        finally:
+            # Annuler la pagination et les lots devenus inutiles (détection précoce, erreur)
+            pending = [task for _, task in window] + ([pager] if pager is not None else [])
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+    
         # Classification finale
-        final_bot_probability = self._calculate_bot_probability(all_transactions)
+        final_bot_probability = self._calculate_bot_probability(all_transactions) if classify else None
         
         execution_time = time.time() - start_time
         self.logger.info(f"Analysis completed in {execution_time:.2f} seconds")
@@ -112,61 +355,182 @@ class SolanaSwapAnalyzer:
         Récupère uniquement les swaps d'un wallet
         """
         self.logger.info(f"Fetching swaps for wallet: {address}")
-        analysis = self.analyze_wallet(address, max_transactions)
+        analysis = self.analyze_wallet(address, max_transactions, classify=False)
         swaps = analysis.get('swaps', [])
         self.logger.info(f"Found {len(swaps)} swaps")
         return swaps
 
-    def _make_rpc_request(self, method: str, params: List) -> Dict:
+    async def _post_rpc(self,
+                        client: httpx.AsyncClient,
+                        semaphore: asyncio.Semaphore,
+                        payload: Union[Dict, List],
+                        timeout: Optional[float] = None) -> Union[Dict, List]:
         """
-        Effectue une requête RPC avec gestion du rate limiting
+        Envoie une requête JSON-RPC, au plus RATE_LIMIT['concurrency'] en parallèle
+        et dans la limite de RATE_LIMIT['requests_per_10s'].
+        Les 429, 5xx et timeouts sont réessayés avec backoff exponentiel et jitter
+        (ou le délai Retry-After annoncé par le fournisseur).
+        """
+        calls = len(payload) if isinstance(payload, list) else 1
+        content = orjson.dumps(payload)
+        for attempt in range(self.config.MAX_RETRIES):
+            await self._rate_limiter.acquire(calls)
+            try:
+                async with semaphore:
+                    response = await client.post(
+                        self.config.SOLANA_RPC_URL,
+                        content=content,
+                        headers={"Content-Type": "application/json"},
+                        timeout=timeout or self.config.RPC_TIMEOUT
+                    )
+                    response.raise_for_status()
+                    return orjson.loads(response.content)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                if (status is not None and status != 429 and status < 500) or attempt + 1 == self.config.MAX_RETRIES:
+                    raise
+                delay = self._retry_delay(attempt, e.response if status is not None else None)
+                self.logger.warning(f"RPC request failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Délai avant réessai : Retry-After s'il est fourni, sinon backoff exponentiel avec jitter"""
+        if response is not None:
+            try:
+                return float(response.headers['Retry-After'])
+            except (KeyError, ValueError):
+                pass
+        base = self.config.RETRY_BACKOFF_BASE
+        return min(self.config.RETRY_BACKOFF_CAP, base * 2 ** attempt) + random.uniform(0, base)
+
+    async def _arpc(self,
+                    client: httpx.AsyncClient,
+                    semaphore: asyncio.Semaphore,
+                    method: str,
+                    params: List) -> Dict:
+        """
+        Effectue une requête RPC
         """
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        
-        if time_since_last < self.config.RATE_LIMIT['min_interval']:
-            time.sleep(self.config.RATE_LIMIT['min_interval'] - time_since_last)
-        
         try:
-            response = requests.post(
-                self.config.SOLANA_RPC_URL,
-                headers={"Content-Type": "application/json"},
-                json={
-                    "jsonrpc": "2.0",
-                    "id": 1,
-                    "method": method,
-                    "params": params
-                },
-                timeout=self.config.RPC_TIMEOUT
-            )
-            response.raise_for_status()
-            self.last_request_time = time.time()
-            return response.json()
+            return await self._post_rpc(client, semaphore, {
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": method,
+                "params": params
+            })
             
         except Exception as e:
             self.logger.error(f"RPC request failed: {e}")
             return {"error": str(e)}
 
-    def _get_transaction(self, signature: str) -> Optional[Dict]:
+    async def _arpc_batch(self,
+                          client: httpx.AsyncClient,
+                          semaphore: asyncio.Semaphore,
+                          calls: List[Tuple[str, List]]) -> List[Dict]:
         """
-        Récupère les détails d'une transaction
+        Effectue plusieurs appels RPC dans une seule requête HTTP (batch JSON-RPC).
+        Les réponses sont renvoyées dans l'ordre des appels.
         """
-        response = self._make_rpc_request(
-            "getTransaction",
-            [signature, {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}]
-        )
-        
-        if "error" in response or not response.get('result'):
-            return None
+        try:
+            results = await self._post_rpc(client, semaphore, [
+                {
+                    "jsonrpc": "2.0",
+                    "id": call_id,
+                    "method": method,
+                    "params": params
+                }
+                for call_id, (method, params) in enumerate(calls)
+            ], timeout=self.config.RPC_BATCH_TIMEOUT)
+
+            # Le serveur peut répondre dans le désordre : réordonner par id
+            by_id = {item.get('id'): item for item in results}
+            return [
+                by_id.get(call_id, {"error": "Missing response"})
+                for call_id in range(len(calls))
+            ]
             
-        return response['result']
+        except Exception as e:
+            self.logger.error(f"RPC batch request failed: {e}")
+            return [{"error": str(e)} for _ in calls]
 
-    def _process_swap(self, transaction: Dict, sig_info: Dict) -> Optional[Dict]:
+    async def _get_signatures_page(self,
+                                   client: httpx.AsyncClient,
+                                   semaphore: asyncio.Semaphore,
+                                   address: str,
+                                   limit: int,
+                                   before: Optional[str] = None) -> Dict:
         """
-        Traite une transaction pour détecter et analyser un swap
+        Récupère une page de signatures, de la plus récente à la plus ancienne
         """
-        is_swap, protocol = self._is_swap_transaction(transaction)
-        if not is_swap:
+        options = {"limit": limit}
+        if before:
+            options["before"] = before
+        return await self._arpc(client, semaphore, "getSignaturesForAddress", [address, options])
+
+    async def _paginate_signatures(self,
+                                   client: httpx.AsyncClient,
+                                   semaphore: asyncio.Semaphore,
+                                   address: str,
+                                   remaining: int,
+                                   before: str,
+                                   queue: asyncio.Queue) -> None:
+        """
+        Récupère les pages de signatures suivantes et publie leurs lots dès
+        réception de chaque page ; publie None dans la file une fois terminé
+        """
+        try:
+            while remaining > 0:
+                limit = min(self.config.SIGNATURES_PAGE_SIZE, remaining)
+                response = await self._get_signatures_page(client, semaphore, address, limit, before)
+                if "error" in response:
+                    self.logger.error("Failed to fetch next signatures page, keeping those already fetched")
+                    break
+                
+                page = response.get('result', [])
+                self.logger.info(f"Found {len(page)} more transactions to analyze")
+                self._enqueue_batches(page, queue)
+                
+                remaining -= len(page)
+                if len(page) < limit:
+                    break
+                before = page[-1]['signature']
+        finally:
+            queue.put_nowait(None)
+
+    def _enqueue_batches(self, signatures: List[Dict], queue: asyncio.Queue) -> None:
+        """
+        Publie les signatures dans la file par tranches de RPC_BATCH_SIZE, dans l'ordre
+        """
+        batch_size = self.config.RPC_BATCH_SIZE
+        for start in range(0, len(signatures), batch_size):
+            queue.put_nowait(signatures[start:start + batch_size])
+
+    async def _get_transactions(self,
+                                client: httpx.AsyncClient,
+                                semaphore: asyncio.Semaphore,
+                                signatures: List[str]) -> List[Optional[Dict]]:
+        """
+        Récupère les détails de plusieurs transactions en un seul appel
+        """
+        responses = await self._arpc_batch(client, semaphore, [
+            ("getTransaction",
+             [signature, {"encoding": "jsonParsed", "maxSupportedTransactionVersion": 0}])
+            for signature in signatures
+        ])
+        
+        failed = sum(1 for response in responses if "error" in response)
+        if failed:
+            self.logger.warning(f"Dropped {failed}/{len(signatures)} transactions after RPC errors")
+        return [
+            None if "error" in response else response.get('result')
+            for response in responses
+        ]
+
+    def _process_swap(self, transaction: Dict, sig_info: Dict, protocol: Optional[str]) -> Optional[Dict]:
+        """
+        Analyse un swap dont le protocole a été détecté par _classify_swaps_batch
+        """
+        if protocol is None:
             return None
             
         tokens_in, tokens_out = self._analyze_token_changes(transaction)
@@ -190,8 +554,7 @@ class SolanaSwapAnalyzer:
             
         try:
             features = self._extract_features(transactions)
-            features_df = pd.DataFrame([features])
-            probability = self.model.predict_proba(features_df)[0][1]
+            probability = self._predict_bot_probability(features)
             
             if probability >= self.config.BOT_THRESHOLD:
                 self.logger.warning(f"Bot behavior detected early with {probability:.2%} probability")
@@ -206,13 +569,12 @@ class SolanaSwapAnalyzer:
         """
         Calcule la probabilité finale qu'un wallet soit un bot
         """
-        if not self.model or not transactions:
+        if not transactions or not self.model:
             return 0.0
             
         try:
             features = self._extract_features(transactions)
-            features_df = pd.DataFrame([features])
-            probability = float(self.model.predict_proba(features_df)[0][1])
+            probability = self._predict_bot_probability(features)
             self.logger.info(f"Final bot probability: {probability:.2%}")
             return probability
             
@@ -220,56 +582,56 @@ class SolanaSwapAnalyzer:
             self.logger.error(f"Final classification failed: {e}")
             return 0.0
 
+    def _predict_bot_probability(self, features: Dict) -> float:
+        """
+        Probabilité "bot" pour un jeu de features, passé au modèle sous forme
+        de ligne NumPy (pas de DataFrame à construire pour une seule ligne)
+        """
+        x = np.fromiter((features[name] for name in FEATURE_NAMES),
+                        dtype=np.float64, count=len(FEATURE_NAMES)).reshape(1, -1)
+        if self._onnx_input is not None:
+            # Sorties ONNX : [labels, probabilités] (tableau, ou dicts si ZipMap)
+            probabilities = self.model.run(None, {self._onnx_input: x.astype(np.float32)})[1]
+            return float(probabilities[0][1])
+        with warnings.catch_warnings():
+            # Modèle entraîné sur un DataFrame : l'ordre des colonnes est garanti par FEATURE_NAMES
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return float(self.model.predict_proba(x)[0][1])
+
     def _analyze_token_changes(self, transaction: Dict) -> Tuple[List[Tuple[float, str]], List[Tuple[float, str]]]:
         """Analyse les changements de balance de tokens dans une transaction"""
         try:
-            pre_balances = {}
-            post_balances = {}
+            meta = transaction.get('meta', {})
+            # Un seul dict de deltas signés par mint ; comme avant, c'est la
+            # dernière balance listée pour un mint qui compte (pre comme post)
+            deltas = {}
+            symbols = {}
             
-            # Analyser les balances pre-transaction
-            for balance in transaction.get('meta', {}).get('preTokenBalances', []):
+            # Balances pre-transaction : la dernière écrase les précédentes
+            for balance in meta.get('preTokenBalances', []):
                 mint = balance.get('mint')
                 if not mint:
                     continue
-                    
-                token_data = balance.get('uiTokenAmount', {})
-                amount = float(token_data.get('uiAmount', 0) or 0)
-                # Utiliser le mint comme symbole si aucun symbole n'est fourni
-                symbol = token_data.get('symbol') or mint[:8]
-                
-                pre_balances[mint] = {
-                    'amount': amount,
-                    'symbol': symbol
-                }
+                deltas[mint] = -float(balance.get('uiTokenAmount', {}).get('uiAmount', 0) or 0)
             
-            # Analyser les balances post-transaction
-            for balance in transaction.get('meta', {}).get('postTokenBalances', []):
+            # Balances post-transaction parcourues à rebours : la première vue est la dernière listée
+            for balance in reversed(meta.get('postTokenBalances', [])):
                 mint = balance.get('mint')
-                if not mint:
+                if not mint or mint in symbols:
                     continue
                     
                 token_data = balance.get('uiTokenAmount', {})
                 amount = float(token_data.get('uiAmount', 0) or 0)
-                symbol = token_data.get('symbol') or mint[:8]
-                
-                post_balances[mint] = {
-                    'amount': amount,
-                    'symbol': symbol
-                }
+                deltas[mint] = deltas.get(mint, 0.0) + amount
+                # Utiliser le mint comme symbole si aucun symbole n'est fourni
+                symbols[mint] = token_data.get('symbol') or mint[:8]
             
             tokens_in = []
             tokens_out = []
             
-            # Calculer les différences
-            all_mints = set(list(pre_balances.keys()) + list(post_balances.keys()))
-            
-            for mint in all_mints:
-                pre_amount = pre_balances.get(mint, {'amount': 0})['amount']
-                post_amount = post_balances.get(mint, {'amount': 0})['amount']
-                symbol = post_balances.get(mint, {'symbol': mint[:8]})['symbol']
-                
-                diff = post_amount - pre_amount
+            for mint, diff in deltas.items():
                 if abs(diff) > 0.000001:  # Seuil minimal pour éviter le bruit
+                    symbol = symbols.get(mint, mint[:8])
                     if diff > 0:
                         tokens_in.append((abs(diff), symbol))
                     else:
@@ -281,31 +643,44 @@ class SolanaSwapAnalyzer:
             self.logger.error(f"Error analyzing token changes: {str(e)}")
             return [], []
     
-    def _is_swap_transaction(self, transaction: Dict) -> Tuple[bool, str]:
-        """Vérifie si une transaction est un swap et retourne le protocole"""
-        self.logger.debug("Vérification si la transaction est un swap...")
-        
-        message = transaction.get('transaction', {}).get('message', {})
-        instructions = message.get('instructions', [])
-        logs = transaction.get('meta', {}).get('logMessages', [])
+    def _classify_swaps_batch(self, transactions: List[Optional[Dict]]) -> List[Optional[str]]:
+        """
+        Protocole de swap de chaque transaction (None si ce n'est pas un swap).
+        Une passe sur les instructions de tout le lot, puis les logs des seules
+        transactions non résolues.
+        """
+        swap_programs = self.config.SWAP_PROGRAMS
+        swap_keys = self._swap_keys
         
         # Vérification dans les instructions
-        for instruction in instructions:
-            program_id = instruction.get('programId')
-            if program_id in self.config.SWAP_PROGRAMS:
-                protocol = self.config.SWAP_PROGRAMS[program_id]
-                self.logger.debug(f"Swap détecté - Protocol: {protocol}")
-                return True, protocol
+        protocols = [
+            next((swap_programs[p]
+                  for instruction in tx.get('transaction', {}).get('message', {}).get('instructions', [])
+                  if (p := instruction.get('programId')) in swap_keys), None)
+            if tx else None
+            for tx in transactions
+        ]
         
         # Vérification dans les logs
-        if logs:
-            for program_id, protocol in self.config.SWAP_PROGRAMS.items():
-                if any(program_id in log for log in logs):
-                    self.logger.debug(f"Swap détecté dans les logs - Protocol: {protocol}")
-                    return True, protocol
+        for i, tx in enumerate(transactions):
+            if protocols[i] is None and tx:
+                logs = tx.get('meta', {}).get('logMessages', [])
+                if logs:
+                    protocols[i] = self._scan_swap_logs(logs)
         
-        self.logger.debug("Aucun swap détecté")
-        return False, ""
+        return protocols
+
+    def _scan_swap_logs(self, logs: List[str]) -> Optional[str]:
+        """Cherche un programme de swap dans les logs d'une transaction"""
+        if self._swap_ac is not None:
+            # Le rang conserve la priorité de SWAP_PROGRAMS si plusieurs programmes apparaissent
+            hit = min((value for _, value in self._swap_ac.iter("\n".join(logs))), default=None)
+            return hit[1] if hit is not None else None
+        
+        for program_id, protocol in self.config.SWAP_PROGRAMS.items():
+            if any(program_id in log for log in logs):
+                return protocol
+        return None
 
     def _extract_features(self, transactions: List[Dict]) -> Dict:
         """Extrait les caractéristiques des transactions pour la classification"""
@@ -314,125 +689,120 @@ class SolanaSwapAnalyzer:
         # Dictionnaire pour stocker les features extraites
         raw_features = {}
         
+        # Un seul passage sur les transactions pour remplir des tableaux préalloués
+        n = len(transactions)
+        ts = np.empty(n, dtype=np.int64)
+        fees = np.empty(n, dtype=np.int64)
+        ic = np.empty(n, dtype=np.int32)
+        slots = np.empty(n, dtype=np.int64)
+        signatures = []
+        # Clés de comptes normalisées une seule fois (str ou {'pubkey': ...})
+        tx_accounts: List[List[str]] = []
+        system_interactions = 0
+        for i, tx in enumerate(transactions):
+            inner = tx.get('transaction', {})
+            accounts = [acc.get('pubkey', '') if isinstance(acc, dict) else acc
+                        for acc in inner.get('message', {}).get('accountKeys', [])]
+            tx_accounts.append(accounts)
+            system_interactions += SYSTEM_PROGRAM in accounts
+            ts[i] = tx.get('blockTime', 0) or 0
+            fees[i] = tx.get('meta', {}).get('fee', 0)
+            ic[i] = len(inner.get('message', {}).get('instructions', []))
+            slots[i] = tx.get('slot', 0)
+            signatures.extend(inner.get('signatures', []))
+        
         # Caractéristiques temporelles de base
-        timestamps = [tx.get('blockTime', 0) for tx in transactions]
-        if len(timestamps) > 1:
-            time_diffs = np.diff(timestamps)
-            raw_features['avg_time_between_tx'] = np.mean(time_diffs)
-            raw_features['time_variance'] = np.std(time_diffs)
+        if n > 1:
+            time_diffs = np.diff(ts)
+            raw_features['avg_time_between_tx'] = time_diffs.mean()
+            raw_features['time_variance'] = time_diffs.std()
         else:
             raw_features['avg_time_between_tx'] = 0
             raw_features['time_variance'] = 0
         
-        self.logger.debug(f"Features temporelles extraites")
+        self.logger.debug("Features temporelles extraites")
         
         # Caractéristiques des transactions
-        raw_features['total_transactions'] = len(transactions)
+        raw_features['total_transactions'] = n
         
         # Analyse des frais
-        fees = [tx.get('meta', {}).get('fee', 0) for tx in transactions]
-        raw_features['avg_fee'] = np.mean(fees) if fees else 0
-        raw_features['std_fee'] = np.std(fees) if fees else 0
+        raw_features['avg_fee'] = fees.mean() if n else 0
+        raw_features['std_fee'] = fees.std() if n else 0
         
         # Analyse des instructions
-        instruction_counts = [len(tx.get('transaction', {}).get('message', {}).get('instructions', [])) 
-                            for tx in transactions]
-        raw_features['avg_instructions_per_tx'] = np.mean(instruction_counts) if instruction_counts else 0
-        raw_features['instruction_complexity_score'] = np.std(instruction_counts) if instruction_counts else 0
-        
-        # Calcul du temps moyen entre transactions pour chaque compte
-        account_time_pairs = defaultdict(list)
-        for tx in transactions:
-            accounts = []
-            message = tx.get('transaction', {}).get('message', {})
-            if 'accountKeys' in message:
-                for acc in message['accountKeys']:
-                    if isinstance(acc, dict):
-                        acc_key = acc.get('pubkey', '')
-                    else:
-                        acc_key = acc
-                    accounts.append(acc_key)
-            
-            timestamp = tx.get('blockTime', 0)
-            for account in accounts:
-                account_time_pairs[account].append(timestamp)
-        
-        account_avg_times = []
-        for timestamps in account_time_pairs.values():
-            if len(timestamps) > 1:
-                times_sorted = sorted(timestamps)
-                time_diffs = np.diff(times_sorted)
-                if len(time_diffs) > 0:
-                    account_avg_times.append(np.mean(time_diffs))
-        
-        raw_features['avg_time_between_account_tx'] = np.mean(account_avg_times) if account_avg_times else 0
+        raw_features['avg_instructions_per_tx'] = ic.mean() if n else 0
+        raw_features['instruction_complexity_score'] = ic.std() if n else 0
+        
+        # Calcul du temps moyen entre transactions pour chaque compte :
+        # groupby NumPy sur des couples (id de compte, timestamp)
+        acct_to_id = {}
+        acct_ids = np.fromiter(
+            (acct_to_id.setdefault(account, len(acct_to_id))
+             for accounts in tx_accounts for account in accounts),
+            dtype=np.int32
+        )
+        acct_ts = np.repeat(ts, [len(accounts) for accounts in tx_accounts])
+        
+        raw_features['avg_time_between_account_tx'] = 0
+        if acct_ids.size:
+            order = np.lexsort((acct_ts, acct_ids))
+            a, t = acct_ids[order], acct_ts[order]
+            starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+            ends = np.r_[starts[1:], a.size]
+            counts = ends - starts
+            # Timestamps triés par compte : moyenne des écarts = (dernier - premier) / (k - 1)
+            multi = counts > 1
+            if multi.any():
+                account_avg_times = (t[ends[multi] - 1] - t[starts[multi]]) / (counts[multi] - 1)
+                raw_features['avg_time_between_account_tx'] = account_avg_times.mean()
         
         # Diversité des comptes
-        all_accounts = []
-        for tx in transactions:
-            message = tx.get('transaction', {}).get('message', {})
-            accounts = message.get('accountKeys', [])
-            all_accounts.extend([acc.get('pubkey', '') if isinstance(acc, dict) else acc for acc in accounts])
-        
-        unique_accounts = set(all_accounts)
-        raw_features['unique_accounts_count'] = len(unique_accounts)
-        raw_features['account_diversity_score'] = len(unique_accounts) / len(all_accounts) if all_accounts else 0
-        
-        # Interactions avec le programme système
-        system_program = '11111111111111111111111111111111'
-        system_interactions = sum(1 for tx in transactions 
-                                if system_program in [acc.get('pubkey', '') if isinstance(acc, dict) else acc 
-                                                    for acc in tx.get('transaction', {}).get('message', {}).get('accountKeys', [])])
-        raw_features['system_program_interaction_ratio'] = system_interactions / len(transactions) if transactions else 0
+        raw_features['unique_accounts_count'] = len(acct_to_id)
+        raw_features['account_diversity_score'] = len(acct_to_id) / acct_ids.size if acct_ids.size else 0
         
-        # Extraction des signatures
-        signatures = []
-        for tx in transactions:
-            tx_signatures = tx.get('transaction', {}).get('signatures', [])
-            signatures.extend(tx_signatures)
+        # Interactions avec le programme système (comptées pendant le passage initial)
+        raw_features['system_program_interaction_ratio'] = system_interactions / len(transactions) if transactions else 0
         
         raw_features['signature_entropy'] = self._calculate_entropy(signatures) if signatures else 0
         
         # Variations de slots
-        slots = [tx.get('slot', 0) for tx in transactions]
-        raw_features['slot_variation'] = np.std(slots) if slots else 0
-        
-        # Liste ordonnée des features comme dans le modèle entraîné
-        ordered_feature_names = [
-            'total_transactions',
-            'avg_fee',
-            'std_fee',
-            'avg_time_between_tx',
-            'time_variance',
-            'avg_time_between_account_tx',
-            'unique_accounts_count',
-            'account_diversity_score',
-            'avg_instructions_per_tx',
-            'instruction_complexity_score',
-            'system_program_interaction_ratio',
-            'signature_entropy',
-            'slot_variation'
-        ]
+        raw_features['slot_variation'] = slots.std() if n else 0
         
-        # Création du DataFrame avec l'ordre correct des features
-        features_ordered = {name: raw_features.get(name, 0) for name in ordered_feature_names}
+        # Dictionnaire dans l'ordre des features du modèle entraîné
+        features_ordered = {name: raw_features.get(name, 0) for name in FEATURE_NAMES}
         
         # Vérification que toutes les features sont présentes
-        missing_features = [feat for feat in ordered_feature_names if feat not in raw_features]
+        missing_features = [feat for feat in FEATURE_NAMES if feat not in raw_features]
         if missing_features:
             self.logger.error(f"Features manquantes: {missing_features}")
             raise ValueError(f"Features manquantes: {missing_features}")
         
         self.logger.info("Extraction des features terminée avec succès")
-        self.logger.debug(f"Features extraites: {features_ordered}")
+        self.logger.debug("Features extraites: %s", features_ordered)
         
         # Retourne le dictionnaire des features dans l'ordre correct
         return features_ordered
     def _calculate_entropy(self, data):
         """Calcule l'entropie d'une liste de données"""
-        if not data:
+        if len(data) < 2:
             return 0
         
-        counts = Counter(data)
-        probabilities = [count/len(data) for count in counts.values()]
-        return -sum(p * np.log2(p) for p in probabilities)
\ No newline at end of file
+        # Seule l'égalité des valeurs compte : un hash 64 bits suffit et évite le tri de chaînes
+        hashed = np.fromiter((hash(item) for item in data), dtype=np.int64, count=len(data))
+        if _entropy_nb is not None:
+            return _entropy_nb(hashed)
+        
+        _, counts = np.unique(hashed, return_counts=True)
+        p = counts / counts.sum()
+        return float(-(p * np.log2(p)).sum())
+
+if __name__ == "__main__":
+    # Export du modèle de détection pour onnxruntime :
+    #   python get_parsed_transactions.py --export-onnx
+    # écrit CONFIG.MODEL_ONNX_PATH à partir de CONFIG.MODEL_PATH
+    from config import CONFIG
+
+    if sys.argv[1:] != ['--export-onnx']:
+        sys.exit("usage: python get_parsed_transactions.py --export-onnx")
+    export_model_to_onnx(CONFIG.MODEL_PATH, CONFIG.MODEL_ONNX_PATH)
+    print(f"ONNX model written to {CONFIG.MODEL_ONNX_PATH}")
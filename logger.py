@@ -5,7 +5,7 @@ from colorama import Fore, Style, init
 # Initialisation de colorama pour Windows
 init(autoreset=True)
 
-class ColoredLogger(logging.Logger):
+class ColoredFormatter(logging.Formatter):
     COLOR_MAP = {
         'DEBUG': Fore.BLUE,
         'INFO': Fore.GREEN,
@@ -14,25 +14,22 @@ class ColoredLogger(logging.Logger):
         'CRITICAL': Fore.RED + Style.BRIGHT
     }
 
-    def __init__(self, name):
-        super().__init__(name)
-
-    def _log(self, level, msg, args, exc_info=None, extra=None):
-        color = self.COLOR_MAP.get(logging.getLevelName(level), '')
-        msg = f"{color}{msg}{Style.RESET_ALL}"
-        super()._log(level, msg, args, exc_info, extra)
+    def format(self, record):
+        # Coloration du message final uniquement, le formatage % reste différé par logging
+        color = self.COLOR_MAP.get(record.levelname, '')
+        return f"{color}{super().format(record)}{Style.RESET_ALL}"
 
 def setup_logger():
-    logging.setLoggerClass(ColoredLogger)
+    console_handler = logging.StreamHandler()  # Envoyer les logs à la console (stdout)
+    console_handler.setFormatter(ColoredFormatter(
+        fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Format du message de log
+        datefmt='%Y-%m-%d %H:%M:%S'  # Format de la date
+    ))
     
     # Create the root logger and set the basic configuration
     logging.basicConfig(
         level=logging.INFO,  # Niveau par défaut pour afficher les logs
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Format du message de log
-        datefmt='%Y-%m-%d %H:%M:%S',  # Format de la date
-        handlers=[
-            logging.StreamHandler()  # Envoyer les logs à la console (stdout)
-        ]
+        handlers=[console_handler]
     )
     root_logger = logging.getLogger()
     for handler in root_logger.handlers:
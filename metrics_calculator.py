@@ -1,22 +1,78 @@
 # metrics_calculator.py
-from typing import Dict, List, Any, Optional
-from decimal import Decimal
-from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
+import logging
+import math
+import numpy as np
 import pandas as pd
 
-@dataclass
-class TokenMetrics:
-    realized_pnl: Decimal = Decimal('0')
-    unrealized_pnl: Decimal = Decimal('0')
-    usd_invested: Decimal = Decimal('0')
-    usd_withdrawn: Decimal = Decimal('0')
-    balance: Decimal = Decimal('0')
-    trade_count: int = 0
-    first_trade_date: Optional[int] = None
-    last_trade_date: Optional[int] = None
+try:
+    from numba import njit
+except ImportError:  # numba est optionnel : repli sur les réductions NumPy
+    njit = None
+
+if njit is not None:
+    @njit(cache=True)
+    def _accumulate_swaps_nb(idx, amount, usd, is_input, ts,
+                             usd_invested, usd_withdrawn, balance, trade_count, last_trade_date):
+        """Applique dans l'ordre les lignes de swap aux colonnes de métriques"""
+        for k in range(idx.shape[0]):
+            i = idx[k]
+            trade_count[i] += 1
+            last_trade_date[i] = ts[k]
+            if np.isnan(usd[k]):  # prix introuvable : seul le trade est compté
+                continue
+            if is_input[k]:
+                usd_invested[i] += usd[k]
+                balance[i] -= amount[k]
+            else:
+                usd_withdrawn[i] += usd[k]
+                balance[i] += amount[k]
+else:
+    _accumulate_swaps_nb = None
+
+class TokenView:
+    """
+    Vue sur la ligne d'un token dans les colonnes de MetricsCalculator.
+    Expose les champs de l'ancien dataclass TokenMetrics en lecture/écriture.
+    """
+    __slots__ = ('_calculator', '_i')
+
+    def __init__(self, calculator: 'MetricsCalculator', i: int):
+        self._calculator = calculator
+        self._i = i
+
+    def _column(name: str, cast):
+        def getter(self):
+            return cast(getattr(self._calculator, name)[self._i])
+
+        def setter(self, value):
+            getattr(self._calculator, name)[self._i] = value
+
+        return property(getter, setter)
+
+    realized_pnl = _column('_realized_pnl', float)
+    unrealized_pnl = _column('_unrealized_pnl', float)
+    usd_invested = _column('_usd_invested', float)
+    usd_withdrawn = _column('_usd_withdrawn', float)
+    balance = _column('_balance', float)
+    trade_count = _column('_trade_count', int)
+    first_trade_date = _column('_first_trade_date', int)
+    last_trade_date = _column('_last_trade_date', int)
+    del _column
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in (
+            'realized_pnl', 'unrealized_pnl', 'usd_invested', 'usd_withdrawn',
+            'balance', 'trade_count', 'first_trade_date', 'last_trade_date'))
+        return f"TokenView({fields})"
 
 class MetricsCalculator:
+    # Colonnes des métriques par token (une ligne par token, indexée via _symbol_to_idx)
+    _FLOAT_COLUMNS = ('_realized_pnl', '_unrealized_pnl', '_usd_invested', '_usd_withdrawn', '_balance')
+    _INT_COLUMNS = ('_trade_count', '_first_trade_date', '_last_trade_date')
+    INITIAL_CAPACITY = 64
+
     def __init__(self, logger, config, price_service, file_service):
         """
         Initialise le calculateur de métriques
@@ -31,87 +87,109 @@ class MetricsCalculator:
         self.config = config
         self.price_service = price_service
         self.file_service = file_service
-        self.token_metrics: Dict[str, TokenMetrics] = {}
+        # Frozenset lié une fois : test d'appartenance par swap sans double lookup d'attribut
+        self._sol_addresses = config.SOLANA_ADDRESSES
+        self._reset_metrics()
+
+    def _reset_metrics(self) -> None:
+        """
+        Réinitialise les colonnes de métriques (float64 pour les montants USD et balances)
+        """
+        self._symbol_to_idx: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        for name in self._FLOAT_COLUMNS:
+            setattr(self, name, np.zeros(self.INITIAL_CAPACITY, dtype=np.float64))
+        for name in self._INT_COLUMNS:
+            setattr(self, name, np.zeros(self.INITIAL_CAPACITY, dtype=np.int64))
+
+    @property
+    def token_metrics(self) -> Dict[str, TokenView]:
+        """
+        Métriques par token, sous forme de vues sur les colonnes (compatibilité)
+        """
+        return {symbol: TokenView(self, i) for symbol, i in self._symbol_to_idx.items()}
+
+    def _grow(self) -> None:
+        """
+        Double la capacité de toutes les colonnes
+        """
+        for name in self._FLOAT_COLUMNS + self._INT_COLUMNS:
+            column = getattr(self, name)
+            setattr(self, name, np.concatenate([column, np.zeros_like(column)]))
+
+    def _token_index(self, symbol: str, timestamp: int) -> int:
+        """
+        Ligne du token dans les colonnes, créée au premier swap
+        """
+        i = self._symbol_to_idx.get(symbol)
+        if i is None:
+            i = len(self._symbols)
+            if i == len(self._balance):
+                self._grow()
+            self._symbol_to_idx[symbol] = i
+            self._symbols.append(symbol)
+            self._first_trade_date[i] = timestamp
+        return i
 
     def _process_token_swap(self, 
                           token_data: Dict[str, Any], 
                           is_input: bool, 
                           timestamp: int,
-                          sol_price: Decimal) -> None:
+                          sol_price: float) -> Tuple[int, float, float, bool, int]:
         """
-        Traite un token dans un swap
+        Résout un token d'un swap en ligne de swap
         
         Args:
             token_data: Données du token
             is_input: True si token en entrée, False si en sortie
             timestamp: Timestamp du swap
             sol_price: Prix du SOL au moment du swap
+            
+        Returns:
+            (ligne du token, montant, valeur USD ou NaN si prix introuvable, is_input, timestamp)
         """
         symbol = token_data['symbol']
-        amount = Decimal(str(token_data['amount']))
+        amount = float(token_data['amount'])
 
-        if symbol not in self.token_metrics:
-            self.token_metrics[symbol] = TokenMetrics(
-                first_trade_date=timestamp,
-                last_trade_date=timestamp
-            )
-        
-        metrics = self.token_metrics[symbol]
-        metrics.last_trade_date = timestamp
-        metrics.trade_count += 1
+        i = self._token_index(symbol, timestamp)
 
         # Calculer la valeur en USD
-        if symbol in self.config.SOLANA_ADDRESSES:
+        if symbol in self._sol_addresses:
             usd_value = amount * sol_price
         else:
-            usd_value = self._calculate_token_value(symbol, amount, timestamp)
+            usd_value = self._calculate_token_value(symbol, amount, timestamp, sol_price)
             if usd_value is None:
-                return
+                usd_value = np.nan
+
+        return i, amount, usd_value, is_input, timestamp
 
-        if is_input:
-            metrics.usd_invested += usd_value
-            metrics.balance -= amount
-        else:
-            metrics.usd_withdrawn += usd_value
-            metrics.balance += amount
     def _calculate_token_value(self, 
                          symbol: str, 
-                         amount: Decimal, 
-                         timestamp: int) -> Optional[Decimal]:
+                         amount: float, 
+                         timestamp: int,
+                         sol_price: float) -> Optional[float]:
         """
-        Calcule la valeur en USD d'un token donné
+        Calcule la valeur en USD d'un token donné (hors SOL, traité par l'appelant)
         
         Args:
             symbol: Symbole du token
             amount: Montant du token
             timestamp: Timestamp pour le prix
+            sol_price: Prix du SOL au moment du swap
             
         Returns:
-            Optional[Decimal]: Valeur en USD ou None si prix non trouvé
+            Optional[float]: Valeur en USD ou None si prix non trouvé
         """
         try:
-            if symbol in self.config.SOLANA_ADDRESSES:
-                sol_price = self.price_service.get_sol_price(timestamp)
-                if sol_price is None:
-                    self.logger.warning(f"Could not get SOL price at {timestamp}")
-                    return None
-                return amount * sol_price
-                
-            # Pour les autres tokens, essayer d'abord d'obtenir le prix en SOL
-            sol_price = self.price_service.get_sol_price(timestamp)
-            if sol_price is None:
-                self.logger.warning("Could not get SOL price for token conversion")
-                return None
-                
             # Essayer d'obtenir le prix du token en SOL
-            token_price_in_sol = self.price_service.get_token_price_in_sol(symbol, timestamp)
+            token_price_in_sol = self.price_service.get_token_price_in_sol(symbol, timestamp, sol_price)
             if token_price_in_sol is not None:
-                return amount * token_price_in_sol * sol_price
+                return amount * float(token_price_in_sol) * sol_price
                 
             # Si pas de prix en SOL, essayer d'obtenir le prix en USD directement
             token_price_in_usd = self.price_service.get_token_price_in_usd(symbol, timestamp)
             if token_price_in_usd is not None:
-                return amount * token_price_in_usd
+                return amount * float(token_price_in_usd)
                 
             self.logger.warning(f"Could not get price for {symbol} at {timestamp}")
             return None
@@ -127,58 +205,132 @@ class MetricsCalculator:
         Args:
             swap: Données du swap
         """
-        timestamp = swap.get('timestamp')
-        if not timestamp:
-            self.logger.warning("Swap without timestamp, skipping")
-            return
+        self._apply_swap_rows(self._collect_swap_rows([swap]))
 
-        # Obtenir le prix du SOL pour ce swap
-        sol_price = self.price_service.get_sol_price(timestamp)
-        if sol_price is None:
-            self.logger.warning(f"Could not get SOL price for timestamp {timestamp}")
-            return
+    def _collect_swap_rows(self, swaps: List[Dict[str, Any]]) -> List[Tuple[int, float, float, bool, int]]:
+        """
+        Passe Python sur les swaps : lignes des tokens et valeurs USD (appels de prix)
+        """
+        # Prix SOL de tous les swaps en une passe vectorisée (arrondi horaire et lookup sur colonnes)
+        timestamps = np.fromiter((swap.get('timestamp') or 0 for swap in swaps),
+                                 dtype=np.int64, count=len(swaps))
+        dated = timestamps != 0
+        sol_prices = np.full(len(swaps), np.nan)
+        if dated.any():
+            sol_prices[dated] = self.price_service.get_sol_prices(timestamps[dated])
 
-        # Traiter les tokens en entrée
-        for token_in in swap['tokens_in']:
-            self._process_token_swap(token_in, True, timestamp, sol_price)
+        rows = []
+        append = rows.append
+        process_token = self._process_token_swap
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        for swap, sol_price in zip(swaps, sol_prices.tolist()):
+            if debug:
+                self.logger.debug("swap=%r", swap)
+            timestamp = swap.get('timestamp')
+            if not timestamp:
+                self.logger.warning("Swap without timestamp, skipping")
+                continue
 
-        # Traiter les tokens en sortie
-        for token_out in swap['tokens_out']:
-            self._process_token_swap(token_out, False, timestamp, sol_price)
+            if math.isnan(sol_price):
+                self.logger.warning(f"Could not get SOL price for timestamp {timestamp}")
+                continue
 
-    def calculate_unrealized_pnl(self) -> None:
+            # Traiter les tokens en entrée
+            for token_in in swap['tokens_in']:
+                append(process_token(token_in, True, timestamp, sol_price))
+
+            # Traiter les tokens en sortie
+            for token_out in swap['tokens_out']:
+                append(process_token(token_out, False, timestamp, sol_price))
+        return rows
+
+    def _apply_swap_rows(self, rows: List[Tuple[int, float, float, bool, int]]) -> None:
         """
-        Calcule le PnL non réalisé pour tous les tokens
+        Accumule les lignes de swap dans les colonnes de métriques (noyau numba si disponible)
         """
-        current_time = int(datetime.now().timestamp())
-        
-        for symbol, metrics in self.token_metrics.items():
-            if metrics.balance <= 0:
-                metrics.unrealized_pnl = Decimal('0')
-                continue
+        if not rows:
+            return
+        idx, amount, usd, is_input, ts = (np.array(column) for column in zip(*rows))
+        idx = idx.astype(np.int64)
+        amount = amount.astype(np.float64)
+        usd = usd.astype(np.float64)
+        is_input = is_input.astype(np.bool_)
+        ts = ts.astype(np.int64)
 
-            if symbol in self.config.SOLANA_ADDRESSES:
-                current_price = self.price_service.get_sol_price(current_time)
-            else:
-                current_price = self.price_service.get_token_price(symbol, current_time)
+        if _accumulate_swaps_nb is not None:
+            _accumulate_swaps_nb(idx, amount, usd, is_input, ts,
+                                 self._usd_invested, self._usd_withdrawn, self._balance,
+                                 self._trade_count, self._last_trade_date)
+            return
+
+        capacity = len(self._balance)
+        priced = ~np.isnan(usd)
+        bought = priced & is_input
+        sold = priced & ~is_input
+        self._trade_count += np.bincount(idx, minlength=capacity)
+        self._usd_invested += np.bincount(idx[bought], weights=usd[bought], minlength=capacity)
+        self._usd_withdrawn += np.bincount(idx[sold], weights=usd[sold], minlength=capacity)
+        self._balance += (np.bincount(idx[sold], weights=amount[sold], minlength=capacity)
+                          - np.bincount(idx[bought], weights=amount[bought], minlength=capacity))
+        # Date du dernier trade : dernière occurrence de chaque ligne dans l'ordre des swaps
+        rows_rev, first_rev = np.unique(idx[::-1], return_index=True)
+        self._last_trade_date[rows_rev] = ts[::-1][first_rev]
 
-            if current_price is not None:
-                metrics.unrealized_pnl = metrics.balance * current_price
+    def _fetch_current_prices(self, live: np.ndarray) -> np.ndarray:
+        """
+        Prix actuels (USD) des tokens encore détenus, en un seul appel groupé au service de prix
+        """
+        symbols = [self._symbols[i] for i in live]
+        prices = self.price_service.get_prices_batch(symbols, int(datetime.now().timestamp()))
+        current = np.full(len(live), np.nan)
+        for k, symbol in enumerate(symbols):
+            price = prices.get(symbol)
+            if price is not None:
+                current[k] = float(price)
             else:
                 self.logger.warning(f"Could not calculate unrealized PnL for {symbol}")
-                metrics.unrealized_pnl = Decimal('0')
+        return current
+
+    def _calculate_realized(self) -> None:
+        """
+        Calcule le PnL réalisé de tous les tokens (colonnes seules, aucun appel de prix)
+        """
+        n = len(self._symbols)
+        invested = self._usd_invested[:n]
+        withdrawn = self._usd_withdrawn[:n]
+        balance = self._balance[:n]
+
+        realized = withdrawn - invested
+        # Position encore ouverte sans retrait, ou balance négative : rien de réalisé
+        realized[((invested > 0) & (withdrawn == 0) & (balance > 0)) | (balance < 0)] = 0.0
+        self._realized_pnl[:n] = realized
+
+    def _calculate_pnl(self) -> None:
+        """
+        Calcule en une passe le PnL réalisé et non réalisé de tous les tokens
+        """
+        self._calculate_realized()
+
+        n = len(self._symbols)
+        balance = self._balance[:n]
+        unrealized = self._unrealized_pnl[:n]
+        unrealized[:] = 0.0
+        live = np.flatnonzero(balance > 0)
+        if live.size:
+            value = balance[live] * self._fetch_current_prices(live)
+            unrealized[live] = np.nan_to_num(value, nan=0.0)
+
+    def calculate_unrealized_pnl(self) -> None:
+        """
+        Calcule le PnL non réalisé pour tous les tokens
+        """
+        self._calculate_pnl()
 
     def calculate_realized_pnl(self) -> None:
         """
         Calcule le PnL réalisé pour tous les tokens
         """
-        for symbol, metrics in self.token_metrics.items():
-            if metrics.usd_invested > 0 and metrics.usd_withdrawn == 0 and metrics.balance > 0:
-                metrics.realized_pnl = Decimal('0')
-            elif metrics.balance < 0:
-                metrics.realized_pnl = Decimal('0')
-            else:
-                metrics.realized_pnl = metrics.usd_withdrawn - metrics.usd_invested
+        self._calculate_realized()
 
     def calculate_metrics(self, swaps: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -190,41 +342,31 @@ class MetricsCalculator:
         Returns:
             Dict contenant toutes les métriques calculées
         """
-        self.token_metrics.clear()
+        self._reset_metrics()
         
         # Traiter tous les swaps
-        for swap in swaps:
-            print(swap)
-            self.process_swap(swap)
+        self._apply_swap_rows(self._collect_swap_rows(swaps))
 
-        # Calculer les PnL
-        self.calculate_realized_pnl()
-        self.calculate_unrealized_pnl()
+        # Calculer les PnL (prix actuels récupérés en un seul lot)
+        self._calculate_pnl()
 
-        # Calcul des métriques globales
+        # Agréger les métriques de tous les tokens (réductions sur les colonnes)
+        n = len(self._symbols)
+        invested = self._usd_invested[:n]
+        withdrawn = self._usd_withdrawn[:n]
+        unrealized = self._unrealized_pnl[:n]
+        
         total_metrics = {
-            'total_realized_pnl': Decimal('0'),
-            'total_unrealized_pnl': Decimal('0'),
-            'gross_profit': Decimal('0'),
-            'total_invested': Decimal('0'),
-            'total_trades': 0,
-            'total_volume': Decimal('0'),
-            'winning_trades': 0,
-            'total_token_traded': len(self.token_metrics)
-        }
-
-        # Agréger les métriques de tous les tokens
-        for metrics in self.token_metrics.values():
-            total_metrics['total_realized_pnl'] += metrics.realized_pnl
-            total_metrics['total_unrealized_pnl'] += metrics.unrealized_pnl
-            total_metrics['total_invested'] += metrics.usd_invested
-            total_metrics['total_trades'] += metrics.trade_count
-            total_metrics['total_volume'] += metrics.usd_invested + metrics.usd_withdrawn
-            
+            'total_realized_pnl': float(self._realized_pnl[:n].sum()),
+            'total_unrealized_pnl': float(unrealized.sum()),
+            'gross_profit': 0.0,
+            'total_invested': float(invested.sum()),
+            'total_trades': int(self._trade_count[:n].sum()),
+            'total_volume': float(invested.sum() + withdrawn.sum()),
             # Compter les trades gagnants
-            if (metrics.usd_withdrawn + metrics.unrealized_pnl) > metrics.usd_invested:
-                total_metrics['winning_trades'] += 1
-
+            'winning_trades': int(((withdrawn + unrealized) > invested).sum()),
+            'total_token_traded': n
+        }
         # Calculer le profit brut
         total_metrics['gross_profit'] = (
             total_metrics['total_realized_pnl'] + 
@@ -248,11 +390,10 @@ class MetricsCalculator:
         else:
             total_metrics['total_roi'] = 0
 
-        # Convertir les Decimal en float pour la sérialisation JSON
-        return {
-            k: float(v) if isinstance(v, Decimal) else v 
-            for k, v in total_metrics.items()
-        }
+        # Une seule écriture du cache de prix par analyse
+        self.price_service.flush()
+
+        return total_metrics
 
     def generate_token_summary(self) -> List[Dict[str, Any]]:
         """
@@ -262,17 +403,17 @@ class MetricsCalculator:
             Liste des résumés par token
         """
         summary = []
-        for symbol, metrics in self.token_metrics.items():
+        for i, symbol in enumerate(self._symbols):
             summary.append({
                 'token': symbol,
-                'usd_invested': float(metrics.usd_invested),
-                'usd_withdrawn': float(metrics.usd_withdrawn),
-                'balance': float(metrics.balance),
-                'trade_count': metrics.trade_count,
-                'first_trade_date': metrics.first_trade_date,
-                'last_trade_date': metrics.last_trade_date,
-                'realized_pnl': float(metrics.realized_pnl),
-                'unrealized_pnl': float(metrics.unrealized_pnl)
+                'usd_invested': float(self._usd_invested[i]),
+                'usd_withdrawn': float(self._usd_withdrawn[i]),
+                'balance': float(self._balance[i]),
+                'trade_count': int(self._trade_count[i]),
+                'first_trade_date': int(self._first_trade_date[i]),
+                'last_trade_date': int(self._last_trade_date[i]),
+                'realized_pnl': float(self._realized_pnl[i]),
+                'unrealized_pnl': float(self._unrealized_pnl[i])
             })
         return summary
     
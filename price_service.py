@@ -1,12 +1,107 @@
 # price_service.py
-import json
+import atexit
+import orjson
 import os
+import random
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import yfinance as yf
 from datetime import datetime, timedelta
 import time
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from decimal import Decimal
+import numpy as np
+
+def round_to_nearest_hour_ts(timestamp: float) -> int:
+    """
+    Arrondit un timestamp à l'heure la plus proche, en arithmétique entière.
+    Si l'heure obtenue est dans le futur, recule sur une bougie déjà clôturée.
+    """
+    rounded = (int(timestamp) + 1800) // 3600 * 3600
+    if rounded > time.time():
+        rounded -= 7200
+    return rounded
+
+def round_to_nearest_hour_vec(timestamps: np.ndarray) -> np.ndarray:
+    """
+    Version vectorisée de round_to_nearest_hour_ts, renvoie des timestamps (int64)
+    """
+    rounded = (np.asarray(timestamps, dtype=np.int64) + 1800) // 3600 * 3600
+    return np.where(rounded > time.time(), rounded - 7200, rounded)
+
+class TokenBucket:
+    """
+    Limiteur de débit à seau de jetons partagé entre threads :
+    `rate` requêtes par seconde, rafales jusqu'à `capacity`
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Bloque jusqu'à ce que `tokens` jetons soient disponibles puis les consomme"""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                time.sleep((tokens - self._tokens) / self.rate)
+
+class CircuitBreaker:
+    """
+    Coupe-circuit d'une API : ouvert après `max_failures` échecs consécutifs,
+    les appels sont alors court-circuités pendant `cooldown` secondes, puis un
+    seul appel d'essai est laissé passer (semi-ouvert)
+    """
+    def __init__(self, max_failures: int, cooldown: float):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True si l'appel peut être tenté (circuit fermé, ou appel d'essai une fois le délai écoulé)"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.cooldown:
+                return False
+            # Un seul appel d'essai : le délai est réarmé pour les autres threads
+            # jusqu'à ce que l'essai rapporte un succès (fermeture) ou un échec
+            self._opened_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.max_failures:
+                # (Ré)ouvre le circuit, y compris après l'essai qui suit le délai
+                self._opened_at = time.monotonic()
+
+def token_cache_key(token: str, timestamp: int) -> str:
+    """
+    Clé de cache d'un prix de token : adresse et numéro de l'heure la plus proche
+    """
+    return f"{token}_{(int(timestamp) + 1800) // 3600}"
 
 class PriceService:
     def __init__(self, logger, config):
@@ -17,92 +112,257 @@ class PriceService:
         self.config = config
         self.price_cache = {
             'token_sol': {},
-            'token_usd': {},
-            'sol_price': {}
+            'token_usd': {}
+        }
+        # Prix SOL horaires : tableau float64 indexé par (ts // 3600 - base), NaN si absent
+        self._sol_base_hour: Optional[int] = None
+        self._sol_prices = np.empty(0, dtype=np.float64)
+        # Le cache n'est écrit sur disque que par flush(), s'il a changé
+        self._dirty = False
+        # Session HTTP partagée (keep-alive) et pool de threads pour les appels Pump Fun / Jupiter
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=config.HTTP_POOL_SIZE,
+            pool_maxsize=config.HTTP_POOL_SIZE,
+            # 429 : on attend le délai Retry-After annoncé par l'API plutôt que de réessayer aussitôt
+            max_retries=Retry(total=config.MAX_RETRIES, backoff_factor=0.5,
+                              status_forcelist=(429, 502, 503, 504),
+                              allowed_methods=frozenset({'GET'}),
+                              respect_retry_after_header=True)
+        )
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=config.PRICE_FETCH_WORKERS)
+        self._pump_fun_breaker = CircuitBreaker(config.PUMP_FUN_BREAKER_FAILURES, config.PUMP_FUN_BREAKER_COOLDOWN)
+        # Un seau de jetons par API : les threads du pool partagent le même débit
+        self._rate_limiters = {
+            api: TokenBucket(rate, burst) for api, (rate, burst) in config.PRICE_API_RATE_LIMITS.items()
         }
+        # Prix Jupiter courants mémoïsés (LRU) : token -> (expiration monotonic, prix) ; les échecs ne sont pas gardés
+        self._jupiter_prices: OrderedDict[str, Tuple[float, Decimal]] = OrderedDict()
+        self._jupiter_prices_lock = threading.Lock()
         self._load_cache()
+        atexit.register(self.flush)
 
     def _load_cache(self) -> Dict[str, float]:
         """
-        Charge le cache des prix à partir du fichier
+        Charge le cache des prix à partir des fichiers
         """
+        array_path = self.config.SOL_PRICE_ARRAY_FILE
+        if os.path.exists(array_path):
+            try:
+                # Copy-on-write : pages chargées à la demande, écritures gardées en mémoire jusqu'à flush()
+                stored = np.load(array_path, mmap_mode='c')
+                # Élément 0 : heure de base, écrite dans le même fichier que les prix
+                self._sol_base_hour = int(stored[0])
+                self._sol_prices = stored[1:]
+            except Exception as e:
+                self.logger.error(f"Error loading SOL price array: {e}")
+
         if os.path.exists(self.config.SOL_PRICE_CACHE_FILE):
             try:
-                with open(self.config.SOL_PRICE_CACHE_FILE, 'r') as f:
-                    loaded_cache = json.load(f)
+                with open(self.config.SOL_PRICE_CACHE_FILE, 'rb') as f:
+                    loaded_cache = orjson.loads(f.read())
                     # Assurez-vous que toutes les clés existent
                     self.price_cache.update(loaded_cache)
-                self.logger.info(f"Loaded price cache with {len(self.price_cache['sol_price'])} entries")
+                # Anciens fichiers : prix SOL sous clé ISO (dans 'sol_price' ou à la racine)
+                legacy = self.price_cache.pop('sol_price', {})
+                for key in [k for k in self.price_cache if k not in ('token_sol', 'token_usd')]:
+                    legacy[key] = self.price_cache.pop(key)
+                if legacy:
+                    hours = [int(datetime.fromisoformat(key).timestamp()) // 3600 for key in legacy]
+                    self._store_sol_prices(hours, list(legacy.values()))
             except Exception as e:
                 self.logger.error(f"Error loading cache: {e}")
+        self.logger.info(f"Loaded price cache with {int(np.count_nonzero(~np.isnan(self._sol_prices)))} entries")
         self.logger.info("Cache initialized")
         return self.price_cache
 
+    def _atomic_write(self, path: str, write, mode: str = 'w') -> None:
+        """
+        Écrit via un fichier temporaire du même dossier puis os.replace
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
     def _save_cache(self) -> None:
         """
-        Sauvegarde le cache des prix dans le fichier
+        Sauvegarde le cache des prix dans les fichiers (écritures atomiques)
         """
         try:
-            with open(self.config.SOL_PRICE_CACHE_FILE, 'w') as f:
-                json.dump(self.price_cache, f)
-            self.logger.debug(f"Saved price cache with {len(self.price_cache)} entries")
+            # Les prix de tokens peuvent être des Decimal
+            self._atomic_write(self.config.SOL_PRICE_CACHE_FILE,
+                               lambda f: f.write(orjson.dumps(self.price_cache, default=float)), mode='wb')
+            if self._sol_base_hour is not None:
+                # Heure de base en tête du tableau : un seul os.replace, prix et base toujours cohérents
+                stored = np.concatenate(([float(self._sol_base_hour)], self._sol_prices))
+                self._atomic_write(self.config.SOL_PRICE_ARRAY_FILE, lambda f: np.save(f, stored), mode='wb')
+            self.logger.debug(f"Saved price cache with {len(self._sol_prices)} hourly slots")
         except Exception as e:
             self.logger.error(f"Error saving cache: {e}")
 
-    def get_sol_price(self, timestamp: int) -> Optional[Decimal]:
+    def flush(self) -> None:
+        """
+        Écrit le cache sur disque s'il a été modifié depuis la dernière écriture
+        """
+        if not self._dirty:
+            return
+        self._save_cache()
+        self._dirty = False
+
+    def _cached_sol_price(self, hour: int) -> Optional[float]:
+        """
+        Prix SOL en cache pour une heure (ts // 3600), None si absent
+        """
+        if self._sol_base_hour is None:
+            return None
+        i = hour - self._sol_base_hour
+        if 0 <= i < len(self._sol_prices):
+            price = self._sol_prices[i]
+            if not np.isnan(price):
+                return float(price)
+        return None
+
+    def _lookup_sol_prices(self, hours: np.ndarray) -> np.ndarray:
+        """
+        Version vectorisée de _cached_sol_price (NaN si absent)
+        """
+        prices = np.full(hours.shape, np.nan)
+        if self._sol_base_hour is not None:
+            i = hours - self._sol_base_hour
+            in_range = (i >= 0) & (i < len(self._sol_prices))
+            prices[in_range] = self._sol_prices[i[in_range]]
+        return prices
+
+    def _store_sol_prices(self, hours, prices) -> None:
+        """
+        Range des prix horaires dans le tableau, étendu de part et d'autre si besoin
+        """
+        hours = np.asarray(hours, dtype=np.int64)
+        if hours.size == 0:
+            return
+        lo, hi = int(hours.min()), int(hours.max())
+        if self._sol_base_hour is None:
+            self._sol_base_hour = lo
+            self._sol_prices = np.full(hi - lo + 1, np.nan)
+        else:
+            base = min(lo, self._sol_base_hour)
+            end = max(hi + 1, self._sol_base_hour + len(self._sol_prices))
+            if base != self._sol_base_hour or end - base != len(self._sol_prices):
+                grown = np.full(end - base, np.nan)
+                offset = self._sol_base_hour - base
+                grown[offset:offset + len(self._sol_prices)] = self._sol_prices
+                self._sol_prices = grown
+                self._sol_base_hour = base
+        self._sol_prices[hours - self._sol_base_hour] = np.asarray(prices, dtype=np.float64)
+        self._dirty = True
+
+    def get_sol_price(self, timestamp: int) -> Optional[float]:
         """
         Obtient le prix du SOL pour un timestamp donné
         """
-        dt = datetime.fromtimestamp(timestamp)
-        dt_str = dt.isoformat()
+        hour_ts = round_to_nearest_hour_ts(timestamp)
+        hour = hour_ts // 3600
 
         # Vérifier le cache
-        if dt_str in self.price_cache:
-            return Decimal(str(self.price_cache[dt_str]))
+        cached = self._cached_sol_price(hour)
+        if cached is not None:
+            return cached
 
-        try:
-            # Récupérer le prix via yfinance
-            sol_data = yf.download(
-                'SOL-USD',
-                start=dt,
-                end=dt + timedelta(hours=1),
-                interval='1h',
-                progress=False
-            )
+        dt = datetime.fromtimestamp(hour_ts)
+        # Si pas de données pour l'heure demandée, essayer les heures précédentes
+        for i in range(self.config.MAX_RETRIES):
+            price = self._download_sol_hour(dt - timedelta(hours=i))
+            if price is not None:
+                self._store_sol_prices([hour], [price])
+                return price
 
-            if not sol_data.empty:
-                price = float(sol_data.iloc[0]['Close'])
-                self.price_cache[dt_str] = price
-                self._save_cache()
-                return Decimal(str(price))
+        self.logger.error(f"Failed to get SOL price for {dt}")
+        return None
 
-            # Si pas de données, essayer l'heure précédente
-            for i in range(1, self.config.MAX_RETRIES):
-                prev_dt = dt - timedelta(hours=i)
+    def _download_sol_hour(self, dt: datetime) -> Optional[float]:
+        """
+        Clôture SOL-USD de la bougie horaire commençant à dt, None si yfinance n'a pas de données.
+        Les erreurs réseau sont réessayées sur la même heure avec backoff exponentiel et jitter.
+        """
+        for attempt in range(self.config.MAX_RETRIES):
+            try:
                 sol_data = yf.download(
                     'SOL-USD',
-                    start=prev_dt,
-                    end=prev_dt + timedelta(hours=1),
+                    start=dt,
+                    end=dt + timedelta(hours=1),
                     interval='1h',
                     progress=False
                 )
-                if not sol_data.empty:
-                    price = float(sol_data.iloc[0]['Close'])
-                    self.price_cache[dt_str] = price
-                    self._save_cache()
-                    return Decimal(str(price))
+            except Exception as e:
+                self.logger.warning(f"Error fetching SOL price for {dt} (attempt {attempt + 1}): {e}")
+                if attempt + 1 < self.config.MAX_RETRIES:
+                    base = self.config.RETRY_BACKOFF_BASE
+                    time.sleep(min(self.config.RETRY_BACKOFF_CAP, base * 2 ** attempt) + random.uniform(0, base))
+                continue
+            if sol_data.empty:
+                return None
+            return float(sol_data['Close'].to_numpy().ravel()[0])
+        return None
 
-            self.logger.error(f"Failed to get SOL price for {dt}")
-            return None
+    def prefetch_sol_prices(self, timestamps: Iterable[int]) -> None:
+        """
+        Précharge en un seul téléchargement yfinance les prix horaires du SOL
+        pour tous les timestamps dont l'heure n'est pas encore en cache
+        """
+        hours = round_to_nearest_hour_vec(np.fromiter(timestamps, dtype=np.int64)) // 3600
+        missing = hours[np.isnan(self._lookup_sol_prices(hours))]
+        if not missing.size:
+            return
 
+        start = datetime.fromtimestamp(int(missing.min()) * 3600) - timedelta(hours=1)
+        end = datetime.fromtimestamp(int(missing.max()) * 3600) + timedelta(hours=2)
+        try:
+            sol_data = yf.download('SOL-USD', start=start, end=end, interval='1h', progress=False)
         except Exception as e:
-            self.logger.error(f"Error fetching SOL price: {e}")
-            return None
-    def get_token_price_in_sol(self, token: str, timestamp: int) -> Optional[Decimal]:
+            self.logger.error(f"Error prefetching SOL prices: {e}")
+            return
+
+        if sol_data.empty:
+            return
+
+        closes = sol_data['Close']
+        if closes.ndim == 2:  # colonnes multi-index (ticker) des versions récentes de yfinance
+            closes = closes.iloc[:, 0]
+        candle_ts = np.fromiter((int(t.timestamp()) for t in closes.index), dtype=np.int64, count=len(closes))
+        prices = closes.to_numpy(dtype=np.float64)
+        valid = ~np.isnan(prices)
+        self._store_sol_prices(round_to_nearest_hour_vec(candle_ts[valid]) // 3600, prices[valid])
+        self.logger.info(f"Prefetched SOL prices from {start} to {end} ({len(closes)} candles)")
+
+    def get_sol_prices(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Prix SOL (float64, NaN si introuvable) pour un tableau de timestamps.
+        Un seul téléchargement pour les heures manquantes, puis lookup vectorisé.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.prefetch_sol_prices(timestamps)
+        hours = round_to_nearest_hour_vec(timestamps) // 3600
+        prices = self._lookup_sol_prices(hours)
+        # Heures absentes du téléchargement groupé : repli heure par heure
+        for hour in np.unique(hours[np.isnan(prices)]).tolist():
+            price = self.get_sol_price(hour * 3600)
+            if price is not None:
+                prices[hours == hour] = price
+        return prices
+
+    def get_token_price_in_sol(self, token: str, timestamp: int,
+                               sol_price: Optional[float] = None) -> Optional[Decimal]:
         """
         Obtient le prix d'un token en SOL
         """
-        cache_key = f"{token}_{timestamp}"
+        cache_key = token_cache_key(token, timestamp)
         
         # Vérifier le cache
         if cache_key in self.price_cache['token_sol']:
@@ -113,15 +373,18 @@ class PriceService:
             price = self._get_token_price_pump_fun(token, timestamp)
             if price is not None:
                 self.price_cache['token_sol'][cache_key] = price
+                self._dirty = True
                 return price
                 
             # Si pas de succès, essayer de convertir le prix Jupiter
             jupiter_price = self._get_token_price_jupiter(token)
             if jupiter_price is not None:
-                sol_price = self.get_sol_price(timestamp)
+                if sol_price is None:
+                    sol_price = self.get_sol_price(timestamp)
                 if sol_price:
-                    price = jupiter_price / sol_price
+                    price = float(jupiter_price) / sol_price
                     self.price_cache['token_sol'][cache_key] = price
+                    self._dirty = True
                     return price
                     
             return None
@@ -134,7 +397,7 @@ class PriceService:
         """
         Obtient le prix d'un token en USD directement
         """
-        cache_key = f"{token}_{timestamp}"
+        cache_key = token_cache_key(token, timestamp)
         
         # Vérifier le cache
         if cache_key in self.price_cache['token_usd']:
@@ -145,6 +408,7 @@ class PriceService:
             price = self._get_token_price_jupiter(token)
             if price is not None:
                 self.price_cache['token_usd'][cache_key] = price
+                self._dirty = True
                 return price
                 
             return None
@@ -157,34 +421,81 @@ class PriceService:
         """
         Obtient le prix d'un token via Pump Fun API (en SOL)
         """
+        # API en panne : on passe directement à Jupiter sans payer le timeout
+        if not self._pump_fun_breaker.allow():
+            return None
         try:
-            response = requests.get(
+            self._rate_limiters['pump_fun'].acquire()
+            response = self._session.get(
                 self.config.PUMP_FUN_API_URL.format(token=token),
                 timeout=self.config.API_TIMEOUT
             )
-            response.raise_for_status()
-            data = response.json()
+            # Un 4xx (token inconnu de Pump Fun) n'est pas une panne de l'API
+            if response.status_code >= 500 or response.status_code == 429:
+                self._pump_fun_breaker.record_failure()
+            else:
+                self._pump_fun_breaker.record_success()
+            if response.status_code >= 400:
+                self.logger.debug(f"Pump Fun API returned {response.status_code} for {token}")
+                return None
+            data = orjson.loads(response.content)
             
             if data and len(data) > 0:
                 return Decimal(str(data[0].get('close', 0)))
                 
             return None
             
+        except requests.exceptions.RequestException as e:
+            if e.response is None:  # timeout, connexion refusée...
+                self._pump_fun_breaker.record_failure()
+            self.logger.debug(f"Pump Fun API error for {token}: {e}")
+            return None
         except Exception as e:
             self.logger.debug(f"Pump Fun API error for {token}: {e}")
             return None
 
     def _get_token_price_jupiter(self, token: str) -> Optional[Decimal]:
         """
-        Obtient le prix d'un token via Jupiter API (en USD)
+        Obtient le prix d'un token via Jupiter API (en USD), mémoïsé JUPITER_PRICE_TTL secondes
+        """
+        now = time.monotonic()
+        with self._jupiter_prices_lock:
+            cached = self._jupiter_prices.get(token)
+            if cached is not None and cached[0] > now:
+                self._jupiter_prices.move_to_end(token)
+                return cached[1]
+
+        price = self._fetch_token_price_jupiter(token)
+        if price is not None:
+            with self._jupiter_prices_lock:
+                self._jupiter_prices[token] = (now + self.config.JUPITER_PRICE_TTL, price)
+                self._jupiter_prices.move_to_end(token)
+                # Éviction de l'entrée la moins récemment utilisée
+                while len(self._jupiter_prices) > self.config.JUPITER_PRICE_CACHE_SIZE:
+                    self._jupiter_prices.popitem(last=False)
+        return price
+
+    def clear_memoized_prices(self) -> None:
+        """
+        Vide la mémoïsation des prix Jupiter (nettoyage périodique)
+        """
+        with self._jupiter_prices_lock:
+            self._jupiter_prices.clear()
+
+    def _fetch_token_price_jupiter(self, token: str) -> Optional[Decimal]:
+        """
+        Requête Jupiter pour un token
         """
         try:
-            response = requests.get(
+            self._rate_limiters['jupiter'].acquire()
+            response = self._session.get(
                 self.config.JUPITER_API_URL.format(token=token),
                 timeout=self.config.API_TIMEOUT
             )
-            response.raise_for_status()
-            data = response.json()
+            if response.status_code >= 400:
+                self.logger.debug(f"Jupiter API returned {response.status_code} for {token}")
+                return None
+            data = orjson.loads(response.content)
             
             if 'data' in data and token in data['data']:
                 return Decimal(str(data['data'][token]['price']))
@@ -195,12 +506,91 @@ class PriceService:
             self.logger.debug(f"Jupiter API error for {token}: {e}")
             return None
 
+    def get_prices_batch(self, tokens: List[str], timestamp: int) -> Dict[str, float]:
+        """
+        Prix USD d'une liste de tokens : une seule requête Jupiter multi-ids,
+        repli sur Pump Fun (prix en SOL) pour les tokens absents de la réponse
+        """
+        prices: Dict[str, float] = {}
+        others = []
+        for token in dict.fromkeys(tokens):
+            if token in self.config.SOLANA_ADDRESSES:
+                sol_price = self.get_sol_price(timestamp)
+                if sol_price is not None:
+                    prices[token] = sol_price
+            else:
+                others.append(token)
+        if not others:
+            return prices
+
+        prices.update(self._get_token_prices_jupiter_batch(others, timestamp))
+
+        missing = [token for token in others if token not in prices]
+        if missing:
+            sol_price = self.get_sol_price(timestamp)
+            if sol_price is not None:
+                prices.update(self._fan_out(
+                    lambda token: self._get_token_price_pump_fun(token, timestamp), missing, sol_price
+                ))
+        return prices
+
+    def _fan_out(self, fetch_in_sol: Callable[[str], Optional[Decimal]],
+                 tokens: List[str], sol_price: float) -> Dict[str, float]:
+        """
+        Exécute fetch_in_sol pour chaque token dans le pool de threads et convertit en USD
+        """
+        prices: Dict[str, float] = {}
+        futures = {self._executor.submit(fetch_in_sol, token): token for token in tokens}
+        for future in as_completed(futures):
+            price_in_sol = future.result()
+            if price_in_sol is not None:
+                prices[futures[future]] = float(price_in_sol) * sol_price
+        return prices
+
+    def _get_token_prices_jupiter_batch(self, tokens: List[str], timestamp: int) -> Dict[str, float]:
+        """
+        Prix USD via Jupiter, une requête multi-ids par groupe de JUPITER_BATCH_SIZE tokens.
+        Les prix sont mis en cache par token et par heure.
+        """
+        cache = self.price_cache['token_usd']
+        prices: Dict[str, float] = {}
+        to_fetch = []
+        for token in tokens:
+            cached = cache.get(token_cache_key(token, timestamp))
+            if cached is not None:
+                prices[token] = float(cached)
+            else:
+                to_fetch.append(token)
+
+        size = self.config.JUPITER_BATCH_SIZE
+        for start in range(0, len(to_fetch), size):
+            chunk = to_fetch[start:start + size]
+            try:
+                # L'API Jupiter accepte plusieurs ids séparés par des virgules
+                self._rate_limiters['jupiter'].acquire()
+                response = self._session.get(
+                    self.config.JUPITER_API_URL.format(token=','.join(chunk)),
+                    timeout=self.config.API_TIMEOUT
+                )
+                if response.status_code >= 400:
+                    self.logger.debug(f"Jupiter API returned {response.status_code} for batch of {len(chunk)} tokens")
+                    continue
+                data = orjson.loads(response.content).get('data') or {}
+            except Exception as e:
+                self.logger.debug(f"Jupiter API error for batch of {len(chunk)} tokens: {e}")
+                continue
+            for token in chunk:
+                if token in data and data[token].get('price') is not None:
+                    prices[token] = float(data[token]['price'])
+                    cache[token_cache_key(token, timestamp)] = prices[token]
+                    self._dirty = True
+        return prices
+
     def update_cache(self, timestamps: List[int]) -> None:
         """
         Met à jour le cache pour une liste de timestamps
         """
-        for ts in timestamps:
-            self.get_sol_price(ts)
+        self.prefetch_sol_prices(timestamps)
 
 class TokenPriceManager:
     """
@@ -208,11 +598,11 @@ class TokenPriceManager:
     """
     def __init__(self, price_service: PriceService):
         self.price_service = price_service
-        self.current_prices: Dict[str, Decimal] = {}
+        self.current_prices: Dict[str, float] = {}
         self.last_update = 0
         self.update_interval = 300  # 5 minutes
 
-    def get_current_prices(self, tokens: List[str]) -> Dict[str, Decimal]:
+    def get_current_prices(self, tokens: List[str]) -> Dict[str, float]:
         """
         Obtient les prix actuels pour une liste de tokens avec mise en cache
         """
@@ -220,7 +610,7 @@ class TokenPriceManager:
         
         # Mise à jour si nécessaire
         if current_time - self.last_update > self.update_interval:
-            self.current_prices = self.price_service.get_token_prices(tokens)
+            self.current_prices = self.price_service.get_prices_batch(tokens, int(current_time))
             self.last_update = current_time
             
         return self.current_prices
\ No newline at end of file
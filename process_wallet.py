@@ -1,10 +1,11 @@
 # process_wallet.py
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
 import redis
 from dotenv import load_dotenv
 import os
+import signal
 import time
-from config import Config
+from config import CONFIG
 from logger import setup_logger
 from database_manager import DatabaseManager
 from get_parsed_transactions import SolanaSwapAnalyzer
@@ -15,20 +16,24 @@ from file_service import FileService, AnalysisFileManager
 load_dotenv()
 
 class WalletProcessor:
-    def __init__(self, logger):
+    def __init__(self,
+                 logger,
+                 analyzer: Optional[SolanaSwapAnalyzer] = None,
+                 price_service: Optional[PriceService] = None):
         """
-        Initialise le processeur de wallet avec tous les services nécessaires
+        Initialise le processeur de wallet avec tous les services nécessaires.
+        Un analyseur et un service de prix déjà construits peuvent être fournis.
         """
         self.logger = logger
-        self.config = Config()  # Assumé que vous avez une classe Config
+        self.config = CONFIG
         
         # Initialisation des services
         self.file_service = FileService(logger, self.config)
         self.analysis_manager = AnalysisFileManager(self.file_service)
-        self.price_service = PriceService(logger, self.config)
+        self.price_service = price_service or PriceService(logger, self.config)
         
         # Initialisation des composants principaux
-        self.analyzer = SolanaSwapAnalyzer(logger, self.config)
+        self.analyzer = analyzer or SolanaSwapAnalyzer(logger, self.config)
         self.metrics_calculator = MetricsCalculator(
             logger=logger,
             config=self.config,
@@ -36,6 +41,15 @@ class WalletProcessor:
             file_service=self.file_service
         )
 
+        # Pool de connexions partagé par toutes les adresses traitées
+        self.db = DatabaseManager(logger)
+        # Résultats en attente d'écriture groupée (une entrée par adresse, la dernière gagne)
+        self._pending_behavior: Dict[str, Dict[str, Any]] = {}
+        self._pending_stats: Dict[str, Dict[str, Any]] = {}
+        # Analyses complètes, écrites dans le cache fichier seulement une fois en base
+        self._pending_analyses: Dict[str, Dict[str, Any]] = {}
+        self._last_db_flush = time.time()
+
         # Connexion Redis
         self.redis_client = redis.Redis(
             host=os.getenv('REDIS_HOST'),
@@ -72,8 +86,8 @@ class WalletProcessor:
         try:
             self.logger.info(f"Starting analysis for address: {address}")
             
-            # Vérifier si une analyse récente existe
-            recent_analysis = self.analysis_manager.get_latest_analysis(
+            # Vérifier si une analyse récente existe (en attente d'écriture ou sur disque)
+            recent_analysis = self._pending_analyses.get(address) or self.analysis_manager.get_latest_analysis(
                 address, 
                 max_age_hours=self.config.ANALYSIS_CACHE_HOURS
             )
@@ -97,7 +111,6 @@ class WalletProcessor:
                         f"High probability bot detected ({behavior_metrics['bot_probability']:.2%}), "
                         "skipping detailed analysis"
                     )
-                    self.save_results_to_db(address, behavior_metrics, None)
                     complete_analysis = {
                         'address': address,
                         'behavior_metrics': behavior_metrics,
@@ -105,6 +118,7 @@ class WalletProcessor:
                         'token_summary': None,
                         'timestamp': int(time.time())
                     }
+                    self.save_results_to_db(address, behavior_metrics, None, complete_analysis)
                 else:
                     # Calculer les métriques de trading
                     trade_metrics = self.metrics_calculator.calculate_metrics(analysis['swaps'])
@@ -119,11 +133,8 @@ class WalletProcessor:
                         'timestamp': int(time.time())
                     }
                     
-                    # Sauvegarder dans la base de données
-                    self.save_results_to_db(address, behavior_metrics, trade_metrics)
-
-                # Sauvegarder l'analyse complète
-                self.analysis_manager.save_wallet_analysis(address, complete_analysis)
+                    # Sauvegarder dans la base de données, puis l'analyse complète
+                    self.save_results_to_db(address, behavior_metrics, trade_metrics, complete_analysis)
 
             # Logger les résultats
             self.log_analysis_results(complete_analysis)
@@ -135,18 +146,68 @@ class WalletProcessor:
     def save_results_to_db(self, 
                           address: str, 
                           behavior_metrics: Dict[str, Any],
-                          trade_metrics: Optional[Dict[str, Any]]) -> None:
+                          trade_metrics: Optional[Dict[str, Any]],
+                          complete_analysis: Dict[str, Any]) -> None:
         """
-        Sauvegarde les résultats dans la base de données
+        Met les résultats en attente ; ils sont écrits par lots via flush_results_to_db.
+        L'analyse complète n'est sauvegardée en fichier qu'après l'écriture en base.
         """
+        self._pending_behavior[address] = behavior_metrics
+        if trade_metrics:
+            self._pending_stats[address] = trade_metrics
+        self._pending_analyses[address] = complete_analysis
+        if len(self._pending_behavior) >= self.config.DB_FLUSH_EVERY:
+            self.flush_results_to_db()
+
+    def flush_results_to_db(self) -> None:
+        """
+        Écrit les résultats en attente dans la base de données, une transaction par table.
+        Si un lot échoue, les wallets sont réécrits un par un et ceux en erreur sont abandonnés.
+        """
+        behavior = list(self._pending_behavior.items())
+        stats = list(self._pending_stats.items())
+        analyses = list(self._pending_analyses.items())
+        # Les buffers sont vidés dans tous les cas : une ligne en erreur ne bloque pas les suivantes
+        self._pending_behavior.clear()
+        self._pending_stats.clear()
+        self._pending_analyses.clear()
+        self._last_db_flush = time.time()
+        if not behavior:
+            return
+
+        failed = set()
         try:
-            with DatabaseManager(self.logger) as db:
-                db.update_behavior_metrics(address, behavior_metrics)
-                if trade_metrics:
-                    db.update_wallet_stats(address, trade_metrics)
+            self.db.update_behavior_metrics_bulk(behavior)
+            self.db.update_wallet_stats_bulk(stats)
         except Exception as e:
-            self.logger.error(f"Database update failed for {address}: {e}")
-            raise
+            self.logger.warning(f"Bulk database update failed ({e}), retrying wallet by wallet")
+            failed = self._save_results_individually(behavior, dict(stats))
+
+        # Cache fichier écrit seulement pour les wallets présents en base : sinon ils seront réanalysés
+        for address, complete_analysis in analyses:
+            if address in failed:
+                continue
+            try:
+                self.analysis_manager.save_wallet_analysis(address, complete_analysis)
+            except Exception as e:
+                self.logger.error(f"Error saving analysis file for {address}: {e}")
+
+    def _save_results_individually(self,
+                                   behavior: List[Tuple[str, Dict[str, Any]]],
+                                   stats: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """
+        Écrit les résultats wallet par wallet, renvoie les adresses en échec
+        """
+        failed = set()
+        for address, behavior_metrics in behavior:
+            try:
+                self.db.update_behavior_metrics(address, behavior_metrics)
+                if address in stats:
+                    self.db.update_wallet_stats(address, stats[address])
+            except Exception as e:
+                self.logger.error(f"Database update failed for {address}, dropping its results: {e}")
+                failed.add(address)
+        return failed
 
     def log_analysis_results(self, results: Dict[str, Any]) -> None:
         """
@@ -192,6 +253,7 @@ class WalletProcessor:
     def cleanup_old_data(self) -> None:
         try:
             self.file_service.cleanup_temp_files()
+            self.price_service.clear_memoized_prices()
             self.analysis_manager.archive_old_analyses(
                 days=self.config.ARCHIVE_AFTER_DAYS
             )
@@ -199,12 +261,34 @@ class WalletProcessor:
         except Exception as e:
             self.logger.error(f"Error during cleanup: {e}")
 
+    def _handle_sigterm(self, signum, frame) -> None:
+        """
+        SIGTERM (docker stop) suit le même chemin d'arrêt que Ctrl+C :
+        les résultats en attente sont écrits avant de quitter
+        """
+        raise KeyboardInterrupt
+
+    def _requeue_addresses(self, addresses: List[str]) -> None:
+        """
+        Remet en tête de file les adresses retirées par BLMPOP mais non traitées, dans leur ordre
+        """
+        if not addresses:
+            return
+        try:
+            self.redis_client.lpush(os.getenv('REDIS_QUEUE_NAME'), *reversed(addresses))
+            self.logger.info(f"Requeued {len(addresses)} unprocessed addresses")
+        except Exception as e:
+            self.logger.error(f"Failed to requeue addresses {addresses}: {e}")
+
     def run(self) -> None:
         """
         Boucle principale de traitement
         """
         self.logger.info("Starting wallet processing service")
+        signal.signal(signal.SIGTERM, self._handle_sigterm)
         last_cleanup = time.time()
+        # Adresses retirées de la file mais pas encore traitées, remises en file à l'arrêt
+        unprocessed: List[str] = []
         
         while True:
             try:
@@ -214,15 +298,28 @@ class WalletProcessor:
                     self.cleanup_old_data()
                     last_cleanup = current_time
 
-                # Traitement des adresses
-                redis_data = self.redis_client.blpop(
-                    os.getenv('REDIS_QUEUE_NAME'),
-                    timeout=5
+                # Traitement des adresses, par lots (BLMPOP, Redis >= 7) : un aller-retour par lot
+                redis_data = self.redis_client.blmpop(
+                    5, 1, os.getenv('REDIS_QUEUE_NAME'),
+                    direction='LEFT',
+                    count=self.config.REDIS_POP_COUNT
                 )
                 
                 if redis_data:
-                    _, address = redis_data
-                    self.process_address(address)
+                    _, addresses = redis_data
+                    unprocessed = list(addresses)
+                    while unprocessed:
+                        address = unprocessed[0]
+                        try:
+                            self.process_address(address)
+                        except Exception as e:
+                            # Les autres adresses du lot sont déjà retirées de la file
+                            self.logger.error(f"Skipping {address} after error: {e}")
+                        del unprocessed[0]
+
+                # Écriture des résultats en attente au plus tard toutes les DB_FLUSH_INTERVAL secondes
+                if time.time() - self._last_db_flush > self.config.DB_FLUSH_INTERVAL:
+                    self.flush_results_to_db()
                 
             except KeyboardInterrupt:
                 self.logger.info("Shutting down gracefully...")
@@ -231,11 +328,17 @@ class WalletProcessor:
                 self.logger.error(f"Unexpected error in main loop: {e}")
                 time.sleep(5)
         
-        # Nettoyage final avant de quitter
+        # Nettoyage final avant de quitter, sans être interrompu par un second SIGTERM
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        self._requeue_addresses(unprocessed)
         try:
             self.cleanup_old_data()
         except Exception as e:
             self.logger.error(f"Error during final cleanup: {e}")
+        finally:
+            self.flush_results_to_db()
+            self.analyzer.close()
+            self.db.close()
 
 def main():
     logger = setup_logger()
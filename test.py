@@ -1,8 +1,14 @@
+import sys
+from config import CONFIG
 from get_parsed_transactions import SolanaSwapAnalyzer
 from logger import setup_logger
-# Initialiser l'analyseur
-logger = setup_logger()
-analyzer = SolanaSwapAnalyzer(logger, "https://mainnet.helius-rpc.com/?api-key=0a4595b2-fcac-4086-a894-d4df21dcd82c")
 
-# Les logs seront maintenant colorés et formatés selon votre configuration
-results = analyzer.analyze_wallet(logger, "CuvaikSrjiwvsBs8W51oRomA3vgjQdgSVxFgXLyhnKq5")
\ No newline at end of file
+if __name__ == "__main__":
+    # Analyse ponctuelle d'une adresse, sans consommer la file Redis
+    logger = setup_logger()
+    analyzer = SolanaSwapAnalyzer(logger, CONFIG)
+    try:
+        address = sys.argv[1] if len(sys.argv) > 1 else "CuvaikSrjiwvsBs8W51oRomA3vgjQdgSVxFgXLyhnKq5"
+        results = analyzer.analyze_wallet(address)
+    finally:
+        analyzer.close()
\ No newline at end of file